@@ -0,0 +1,169 @@
+"""
+Engines that run the stages of df_clean (pipeline.get_clean_stages).
+pandas runs every stage eagerly, one after the other.
+polars runs only the five leading row-level stages (polars_stages: delete_unknown_shared_acc,
+drop_null, rename, filter_month, drop_duplicates) as one lazy plan, collected once to pandas.
+drop_null first collects a one-row plan of null flags to know which columns to drop.
+The input is the raw df already filtered to the month by ingest (module.read_month_cached),
+so there is no scan to push the month filter into. The mapping, rule and assign stages
+and df_session run on pandas in both engines, the rules are kept in module only.
+Both engines return the same df_clean, see tests/test_backend.py.
+
+Usage:
+    stages = backend.get_stages(pipeline.get_clean_stages(month, df_teacher), "polars")
+    python -m pipeline --year 2024 --month 5 --engine polars
+"""
+
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import module
+
+try:
+    import polars as pl
+except ImportError:  # polars is only needed for engine = "polars"
+    pl = None
+
+engines = ["pandas", "polars"]
+
+
+# polars version of stages in pipeline.get_clean_stages, same name and result
+# each takes and returns pl.LazyFrame, keyword arguments are the ones of the pandas stage
+
+
+def _pandas_mask(func, col: str) -> "pl.Expr":
+    """
+        Return polars expression of a pandas mask rule over col, e.g. module.is_shared_account.
+        func runs on the distinct values of col only, so the rule stays in module for both engines.
+
+    Args:
+        func (callable): Takes pd.Series, returns bool pd.Series of the same length.
+        col (str): Column name.
+
+    Returns:
+        pl.Expr: Bool expression.
+    """
+
+    def apply(series: "pl.Series") -> "pl.Series":
+        uniques = series.unique()
+        mask = pl.Series(func(uniques.to_pandas()).to_numpy(), dtype=pl.Boolean)
+        return series.replace_strict(uniques, mask, return_dtype=pl.Boolean)
+
+    return pl.col(col).map_batches(apply, return_dtype=pl.Boolean)
+
+
+def _delete_unknown_shared_acc(lf: "pl.LazyFrame") -> "pl.LazyFrame":
+    # see module.delete_unknown_shared_acc_teacher
+    unknown = _pandas_mask(module.is_shared_account, "Teacher") & pl.col("Description").is_null()
+    return lf.filter(~unknown)
+
+
+def _drop_null(lf: "pl.LazyFrame") -> "pl.LazyFrame":
+    # see pipeline._drop_null
+    # note: which columns are all null depends on the data, so only the one row of
+    # null flags is collected here, the plan itself stays lazy until run_lazy
+    is_null = lf.select(pl.all().is_null().all()).collect().row(0, named=True)
+    return lf.drop([col for col, all_null in is_null.items() if all_null]).filter(
+        ~pl.all_horizontal(pl.all().is_null())
+    )
+
+
+def _rename(lf: "pl.LazyFrame") -> "pl.LazyFrame":
+    # see pipeline._rename
+    return lf.rename(
+        {
+            col: module.map_col.get(col, col).lower().replace(" ", "_")
+            for col in lf.collect_schema().names()
+        }
+    )
+
+
+def _filter_month(lf: "pl.LazyFrame", month: int, is_utc: bool) -> "pl.LazyFrame":
+    # see pipeline._filter_month and module.convert_to_gmt_plus_7
+    class_date = pl.col("class_date")
+    if is_utc:
+        class_date = class_date.dt.replace_time_zone("UTC").dt.convert_time_zone("Asia/Jakarta")
+    return lf.with_columns(class_date=class_date).filter(pl.col("class_date").dt.month() == month)
+
+
+def _drop_duplicates(lf: "pl.LazyFrame") -> "pl.LazyFrame":
+    # see pipeline._drop_duplicates, keep first and keep order like pandas
+    return lf.unique(
+        subset=["student_code", "student_name", "class_time", "class_date"],
+        keep="first",
+        maintain_order=True,
+    )
+
+
+polars_stages = {
+    "delete_unknown_shared_acc": _delete_unknown_shared_acc,
+    "drop_null": _drop_null,
+    "rename": _rename,
+    "filter_month": _filter_month,
+    "drop_duplicates": _drop_duplicates,
+}
+
+
+def _to_pandas(df: "pl.DataFrame") -> pd.DataFrame:
+    """Return df as pandas, with missing str as NaN like the pandas stages."""
+    df = df.to_pandas()
+    for col in df.select_dtypes("object").columns:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def run_lazy(df: pd.DataFrame, names: tuple, kwargs: dict) -> pd.DataFrame:
+    """
+        Run polars_stages as one lazy plan and collect it.
+
+    Args:
+        df (pd.DataFrame): Input of the first stage.
+        names (tuple): Names of stages in polars_stages, in order.
+        kwargs (dict): Keyword arguments of each stage, by name.
+
+    Returns:
+        pd.DataFrame: Output of the last stage.
+    """
+    lf = pl.from_pandas(df).lazy()
+    for name in names:
+        lf = polars_stages[name](lf, **kwargs.get(name, {}))
+    return _to_pandas(lf.collect())
+
+
+def get_stages(stages: list, engine: str = "pandas") -> list:
+    """
+        Return stages to run with engine.
+        For polars, the leading stages that have a polars version are replaced by
+        one stage "polars" that runs them as one lazy plan, other stages are kept.
+        Checkpoints and profile of pipeline.run_stages work the same for both engines.
+
+    Args:
+        stages (list): [(name, function, dependencies)], e.g. pipeline.get_clean_stages.
+        engine (str, optional): pandas or polars. Defaults to "pandas".
+
+    Returns:
+        list: [(name, function, dependencies)].
+    """
+    if engine not in engines:
+        raise ValueError(f"Unknown engine {engine}, expected one of {engines}")
+    if engine == "pandas":
+        return stages
+    if pl is None:
+        raise ImportError("engine polars needs polars, pip install polars")
+
+    n_lazy = 0
+    while n_lazy < len(stages) and stages[n_lazy][0] in polars_stages:
+        n_lazy += 1
+    if n_lazy == 0:
+        return stages
+
+    names = tuple(name for name, _, _ in stages[:n_lazy])
+    # keyword arguments of pandas stages, e.g. month of filter_month
+    kwargs = {name: getattr(func, "keywords", {}) for name, func, _ in stages[:n_lazy]}
+    deps = [polars_stages[name] for name in names]
+    for _, _, stage_deps in stages[:n_lazy]:
+        deps += stage_deps
+    lazy_stage = ("polars", partial(run_lazy, names=names, kwargs=kwargs), deps)
+    return [lazy_stage, *stages[n_lazy:]]
@@ -0,0 +1,289 @@
+"""
+Benchmark the pipeline on synthetic data (see synthetic.py), stage by stage.
+Records time and peak memory (tracemalloc) of ingest, each df_clean and df_session stage,
+validation and export, so a slow change shows up as a number.
+measure_memory records peak RSS of the whole chain in a fresh process,
+see tests/test_memory.py.
+
+Usage:
+    python -m benchmark --scale 1 10
+    python -m benchmark --scale 1 --output bench.csv
+    python -m benchmark --scale 1 --compare bench.csv  # ratio to a previous run
+"""
+
+import argparse
+import contextlib
+import gc
+import multiprocessing
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import backend
+import module
+import pipeline
+import synthetic
+import validation
+
+
+class _Timer:
+    """Collect time and peak memory of each stage."""
+
+    def __init__(self, scale: float, trace_memory: bool = True):
+        self.scale = scale
+        self.trace_memory = trace_memory
+        self.records = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = {}
+        try:
+            yield result
+        finally:
+            seconds = time.perf_counter() - start
+            peak_mb = np.nan
+            if self.trace_memory:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            self.records.append(
+                {
+                    "scale": self.scale,
+                    "stage": name,
+                    "seconds": seconds,
+                    "peak_mb": peak_mb,
+                    "rows": result.get("rows", np.nan),
+                }
+            )
+
+
+@contextlib.contextmanager
+def _patch(obj, **attrs):
+    """Temporarily set attributes of obj, e.g. module globals."""
+    old = {name: getattr(obj, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        for name, value in old.items():
+            setattr(obj, name, value)
+
+
+def _as_read(df_export: pd.DataFrame, n_exports: int) -> pd.DataFrame:
+    """Return df_export as load_raw_data would read it, without writing excel."""
+    raw_schema = {
+        raw: module.ingest_schema[col]
+        for raw, col in module.map_col.items()
+        if col in module.ingest_schema and raw in df_export
+    }
+    df = df_export.loc[np.tile(df_export.index, n_exports), list(raw_schema)].reset_index(drop=True)
+    for col, dtype in raw_schema.items():
+        if dtype.startswith("datetime"):
+            df[col] = pd.to_datetime(df[col], format=module.ingest_date_formats.get(col))
+        elif dtype != "str":
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def run_benchmark(
+    scale: float = 1,
+    year: int = 2024,
+    month: int = 5,
+    ingest: bool = True,
+    n_jobs: int = 1,
+    trace_memory: bool = True,
+    seed: int = 0,
+    engine: str = "pandas",
+) -> pd.DataFrame:
+    """
+        Run the pipeline once on synthetic data of the given scale.
+        Stages run without checkpoints, in a temporary folder.
+
+    Args:
+        scale (float, optional): 1 = about a real month. Defaults to 1.
+        year (int, optional): Defaults to 2024.
+        month (int, optional): Defaults to 5.
+        ingest (bool, optional): Write and read excel files. Defaults to True.
+        n_jobs (int, optional): Processes to parse input files. Defaults to 1.
+        trace_memory (bool, optional): Record peak memory, slows down stages. Defaults to True.
+        seed (int, optional): Random seed. Defaults to 0.
+        engine (str, optional): Engine of df_clean stages, see backend.get_stages.
+
+    Returns:
+        pd.DataFrame: One row per stage with seconds, peak_mb and rows.
+    """
+    timer = _Timer(scale, trace_memory)
+    df_teacher_sheet_name = f"{year}-{month:02d}"
+
+    with tempfile.TemporaryDirectory() as folder:
+        cache_dir = Path(folder, "cache")
+        with timer.stage("generate") as result:
+            df_export, df_teacher = synthetic.make_month(year, month, scale, seed)
+            result["rows"] = len(df_export)
+        path_raw_data, path_trainer_data = synthetic.write_month(
+            df_export, df_teacher, folder, year, month, seed=seed
+        ) if ingest else (None, Path(folder, "trainer.xlsx"))
+        if not ingest:
+            df_teacher.to_excel(path_trainer_data, sheet_name=df_teacher_sheet_name, index=False)
+
+        with _patch(module, path_trainer_data=path_trainer_data, path_cache=cache_dir):
+            if ingest:
+                for name in ["ingest", "ingest_cached"]:
+                    with timer.stage(name) as result:
+                        df = module.load_raw_data(
+                            path_raw_data, True, month=month, is_utc=False,
+                            n_jobs=n_jobs, cache_dir=cache_dir,
+                        )
+                        result["rows"] = len(df)
+            else:
+                df = _as_read(df_export, n_exports=14)
+
+            with timer.stage("student_name") as result:
+                df = module.clean_student_name(df)
+                result["rows"] = len(df)
+            with timer.stage("trainer") as result:
+                df_teacher = module.load_df_teacher(df_teacher_sheet_name)
+                result["rows"] = len(df_teacher)
+
+            df_clean = df
+            clean_stages = backend.get_stages(pipeline.get_clean_stages(month, df_teacher), engine)
+            for name, func, _ in clean_stages:
+                with timer.stage(f"clean.{name}") as result:
+                    df_clean = func(df_clean)
+                    result["rows"] = len(df_clean)
+
+            df_session = df_clean
+            for name, func, _ in pipeline.get_session_stages(df_teacher_sheet_name):
+                with timer.stage(f"session.{name}") as result:
+                    df_session = func(df_session)
+                    result["rows"] = len(df_session)
+
+            with timer.stage("validation") as result:
+                report = validation.validate(df, df_clean, df_session, df_teacher_sheet_name)
+                result["rows"] = int(report["n_violations"].sum())
+            if not report["passed"].all():
+                print(validation.format_report(report))
+
+            with timer.stage("export") as result, contextlib.chdir(folder):
+                pipeline.save_df(df_clean, df_session, year, month, overwrite=True)
+                result["rows"] = len(df_clean) + len(df_session)
+
+    return pd.DataFrame(timer.records)
+
+
+def _memory_status_mb(field: str) -> float:
+    """Return VmRSS (current RSS) or VmHWM (peak RSS) of this process, linux only."""
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith(f"{field}:"):
+            return int(line.split()[1]) / 2**10  # in kB
+    raise ValueError(f"{field} not in /proc/self/status")
+
+
+def _measure_chain(path_input: Path, path_trainer_data: Path, year: int, month: int) -> dict:
+    """Run df_clean and df_session chains on pickled raw df, return input size and RSS."""
+    df_teacher_sheet_name = f"{year}-{month:02d}"
+    cache_dir = Path(path_input.parent, "cache")
+    with _patch(module, path_trainer_data=path_trainer_data, path_cache=cache_dir):
+        # trainer roster is parsed before measuring, it is cached in the process
+        module.load_df_teacher(df_teacher_sheet_name)
+        df = pd.read_pickle(path_input)
+        input_mb = df.memory_usage(deep=True).sum() / 2**20
+        gc.collect()
+        # note: peak RSS is inherited from the parent process, reset it to current RSS
+        Path("/proc/self/clear_refs").write_text("5")
+        rss_mb = _memory_status_mb("VmRSS")
+        df = module.clean_student_name(df)
+        df_clean = pipeline.create_df_clean(df, month, df_teacher_sheet_name, path_checkpoint=None)
+        pipeline.create_df_session(df_clean, df_teacher_sheet_name, path_checkpoint=None)
+    peak_mb = _memory_status_mb("VmHWM")
+    return {"input_mb": input_mb, "rss_mb": rss_mb, "peak_mb": peak_mb}
+
+
+def measure_memory(scale: float = 1, year: int = 2024, month: int = 5, seed: int = 0) -> dict:
+    """
+        Measure peak RSS of clean_student_name, df_clean and df_session chains
+        on synthetic data, in a fresh process so that earlier allocations do not count.
+
+    Args:
+        scale (float, optional): 1 = about a real month. Defaults to 1.
+        year (int, optional): Defaults to 2024.
+        month (int, optional): Defaults to 5.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        dict: input_mb (raw df), rss_mb (before the chains), peak_mb,
+            growth_mb = peak_mb - rss_mb and ratio = growth_mb / input_mb.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        df_export, df_teacher = synthetic.make_month(year, month, scale, seed)
+        path_input = Path(folder, "raw.pkl")
+        _as_read(df_export, n_exports=14).to_pickle(path_input)
+        path_trainer_data = Path(folder, "trainer.xlsx")
+        df_teacher.to_excel(path_trainer_data, sheet_name=f"{year}-{month:02d}", index=False)
+        del df_export, df_teacher
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(
+                _measure_chain, path_input, path_trainer_data, year, month
+            ).result()
+    result["growth_mb"] = result["peak_mb"] - result["rss_mb"]
+    result["ratio"] = result["growth_mb"] / result["input_mb"]
+    return result
+
+
+def compare(df_bench: pd.DataFrame, df_baseline: pd.DataFrame) -> pd.DataFrame:
+    """Return seconds and peak_mb of df_bench as ratio to df_baseline, per scale and stage."""
+    return (
+        df_bench
+        .merge(df_baseline, on=["scale", "stage"], how="left", suffixes=("", "_baseline"))
+        .assign(
+            seconds_ratio=lambda df_: df_["seconds"] / df_["seconds_baseline"],
+            peak_mb_ratio=lambda df_: df_["peak_mb"] / df_["peak_mb_baseline"],
+        )
+        [["scale", "stage", "seconds", "seconds_ratio", "peak_mb", "peak_mb_ratio", "rows"]]
+    )
+
+
+def main(args: list = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data.")
+    parser.add_argument("--scale", type=float, nargs="+", default=[1], help="1 = about a real month")
+    parser.add_argument("--no-ingest", action="store_true", help="skip writing and reading excel")
+    parser.add_argument("--no-memory", action="store_true", help="do not trace memory, faster")
+    parser.add_argument("--n-jobs", type=int, default=1, help="processes to parse input files")
+    parser.add_argument("--engine", choices=backend.engines, default="pandas", help="engine of df_clean stages")
+    parser.add_argument("--output", type=Path, help="save result as csv")
+    parser.add_argument("--compare", type=Path, help="csv of a previous run to compare with")
+    args = parser.parse_args(args)
+
+    df_bench = pd.concat(
+        [
+            run_benchmark(
+                scale,
+                ingest=not args.no_ingest,
+                n_jobs=args.n_jobs,
+                trace_memory=not args.no_memory,
+                engine=args.engine,
+            )
+            for scale in args.scale
+        ],
+        ignore_index=True,
+    )
+    if args.compare is not None:
+        df_bench = compare(df_bench, pd.read_csv(args.compare))
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(df_bench.round(3).to_string(index=False))
+    if args.output is not None:
+        df_bench.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
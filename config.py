@@ -1,6 +1,7 @@
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import pandas as pd
 
 
 load_dotenv()  # load secret env variable for trainer data
@@ -11,6 +12,14 @@ df_trainer_sheet_name = "2024-05"  # sheet name in trainer data
 is_utc = False  # specify if date is in utc (data from ken)
 is_mutiple_files = True  # multiple files or one file
 path_trainer_data = os.getenv("path_trainer_data")  # path for trainer data
+path_cache = Path("cache")  # cache of parsed input files, safe to delete
+path_checkpoint = Path("cache", "stages")  # checkpoint of each stage, None = no checkpoint
+checkpoint_max_age_days = 7  # checkpoints unused for longer are deleted
+n_jobs = None  # processes used to parse input files, None = all cores
+profile = False  # save time, rows and memory of each stage to output folder
+output_formats = ["parquet", "xlsx"]  # formats of output files, xlsx is the slowest
+path_store = Path("store")  # history of all processed months, see store.py
+engine = "pandas"  # engine of df_clean stages, "pandas" or "polars" (lazy, all cores), see backend.py
 
 
 # map centers
@@ -39,31 +48,91 @@ class CenterMap:
             "RST": "RST",
             "NST": "NST",
         }
+        # how centers are written in class description
+        self.center_alias = {
+            "pacific place": "PP",
+            "sedayu city": "SDC",
+            "kelapa gading": "KG",
+            "gandaria city": "GC",
+            "gandaira city": "GC",
+            "gandaira": "GC",
+            "living world": "LW",
+            "tb simatupang": "TBS",
+            "simatupang": "TBS",
+            "kota kasablanka": "KK",
+            "kokas": "KK",
+            "cibubur": "CBB",
+            "pakuwon": "PKW",
+            "dago": "DG",
+        }
+        # precomputed indexes, so lookups do not scan center_area
+        # frozenset, so that callers cannot change the shared indexes
+        self.centers = frozenset(self.center_area)
+        self.areas = frozenset(self.center_area.values())
+        self.area_centers = {
+            area: frozenset(c for c, a in self.center_area.items() if a == area)
+            for area in self.areas
+        }
 
-    def get_center(self) -> set:
+    def get_center(self) -> frozenset:
         """Return set of centers."""
-        return set(k for k, v in self.center_area.items())
+        return self.centers
 
-    def get_area(self) -> set:
+    def get_area(self) -> frozenset:
         """Return list of areas."""
-        return set(v for k, v in self.center_area.items())
+        return self.areas
 
     def get_center_area_map(self) -> dict:
         """Returns center: area"""
         return self.center_area
 
+    def get_center_alias(self) -> dict:
+        """Returns alias in class description: center"""
+        return self.center_alias
+
     def lookup_area(self, center) -> set:
         """Return area of inputted center."""
-        if center not in self.center_area.keys():
+        if center not in self.centers:
             raise ValueError(
-                f"Center {center} is not a valid center. Select one of {set(self.center_area.keys())}"
+                f"Center {center} is not a valid center. Select one of {self.centers}"
             )
         return self.center_area[center]
 
-    def lookup_centers(self, area) -> set:
+    def lookup_centers(self, area) -> frozenset:
         """Return centers of inputted area."""
-        if area not in self.center_area.values():
+        if area not in self.area_centers:
             raise ValueError(
-                f"Area {area} is not a valid area. Select one of {set(self.center_area.values())}"
+                f"Area {area} is not a valid area. Select one of {self.areas}"
             )
-        return set(k for k, v in self.center_area.items() if v == area)
+        return self.area_centers[area]
+
+    def map_areas(
+        self, centers: pd.Series, areas: list = None, other: dict = None, default="Error"
+    ) -> pd.Series:
+        """
+            Return area of each center in one pass, as categorical.
+
+        Args:
+            centers (pd.Series): Centers to map.
+            areas (list, optional): Areas to keep, centers of other areas get default.
+                Defaults to None = all areas.
+            other (dict, optional): Other values to map, e.g. {"Online": "Online"}.
+                Defaults to None.
+            default (optional): Area of unknown center. None = NaN. Defaults to "Error".
+
+        Returns:
+            pd.Series: Categorical area.
+        """
+        areas = list(dict.fromkeys(self.center_area.values())) if areas is None else list(areas)
+        other = other or {}
+        mapping = {
+            center: area for center, area in self.center_area.items() if area in areas
+        }
+        mapping.update(other)
+        categories = list(dict.fromkeys([*areas, *other.values()]))
+        if default is not None:
+            categories = list(dict.fromkeys([*categories, default]))
+        mapped = centers.map(mapping).astype(pd.CategoricalDtype(categories))
+        if default is not None:
+            mapped = mapped.fillna(default)
+        return mapped
@@ -1,14 +1,32 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
+from rapidfuzz import fuzz, process, utils
 
 import config
 
+# copy-on-write: frames returned by assign, rename, astype, reset_index, ... share
+# columns with their input until a column is changed, so stages do not copy whole frames.
+# default in pandas 3
+pd.set_option("mode.copy_on_write", True)
+
 
 # configuration
 is_utc = config.is_utc
+is_mutiple_files = config.is_mutiple_files
+path_raw_data = config.path_raw_data
 df_teacher_sheet_name = config.df_trainer_sheet_name
 month = config.month
 path_trainer_data = config.path_trainer_data
+path_cache = config.path_cache
+n_jobs = config.n_jobs
 center_map = config.CenterMap()  # initialize center map class
 
 
@@ -34,19 +52,401 @@ map_col = {
     "Teacher": "Teacher",
 }
 
+# dtype of columns used by the pipeline, keyed by column name after map_col
+# ! other columns in the export are not read
+ingest_schema = {
+    "Student Name": "str",
+    "Student Code": "Int64",
+    "Student Membership": "str",
+    "Student Center": "str",
+    "Student Result": "str",
+    "Class Type": "str",
+    "Class Date": "datetime64[ns]",
+    "Class Time": "str",
+    "Class Description": "str",
+    "Class Duration": "float64",
+    "Teacher": "str",
+}
+
+# date format per raw column, None = inferred
+ingest_date_formats = {
+    "Class Startdate": "%b %d %Y",  # data from coco, e.g. May 10 2024
+    "startdate": None,  # data from ken
+}
+
+
+def read_excel_with_schema(
+    path: Path, schema: dict = ingest_schema, **kwargs
+) -> pd.DataFrame:
+    """
+        Read only the columns in schema, with declared dtype.
+        Schema is keyed by column name after map_col, so it is translated
+        back to the raw column names of both coco and ken exports.
+
+    Args:
+        path (Path): Excel file.
+        schema (dict, optional): Column: dtype. Defaults to ingest_schema.
+        **kwargs: Passed to pd.read_excel.
+
+    Returns:
+        pd.DataFrame: Df with raw column names.
+    """
+    raw_schema = {raw: schema[col] for raw, col in map_col.items() if col in schema}
+    date_cols = [raw for raw, dtype in raw_schema.items() if dtype.startswith("datetime")]
+    df = pd.read_excel(
+        path,
+        usecols=lambda c: c in raw_schema,
+        dtype={raw: dtype for raw, dtype in raw_schema.items() if raw not in date_cols},
+        **kwargs,
+    )
+    for col in date_cols:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format=ingest_date_formats.get(col))
+    return df
+
+
+def hash_file(path: Path) -> str:
+    """Return sha256 hex digest of file content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_df(df: pd.DataFrame) -> str:
+    """Return sha256 hex digest of df content, including column names."""
+    digest = hashlib.sha256(json.dumps(list(map(str, df.columns))).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _hash_default(obj):
+    """Return json serializable value of obj for hash_obj, same in every process."""
+    if isinstance(obj, (set, frozenset)):  # set order depends on the process
+        return sorted(obj, key=str)
+    if isinstance(obj, re.Pattern):  # str of long pattern is truncated
+        return [obj.pattern, obj.flags]
+    return str(obj)
+
+
+def hash_obj(obj) -> str:
+    """Return sha256 hex digest of json serializable object, e.g. mapping dict."""
+    return hashlib.sha256(
+        json.dumps(obj, sort_keys=True, default=_hash_default).encode()
+    ).hexdigest()
+
+
+def _make_parquet_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+        Parquet cannot store object column with mixed types,
+        e.g. Unit column which contains both level number and unit name.
+        Convert the non-null values of those columns to str.
+
+    Args:
+        df (pd.DataFrame)
+
+    Returns:
+        pd.DataFrame
+    """
+    for col in df.select_dtypes("object").columns:
+        values = df[col].dropna()
+        if values.map(type).nunique() > 1:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _cache_file(path: Path, cache_dir: Path, schema: dict, kwargs: dict) -> Path:
+    """Return cache path (without suffix) keyed by file content, schema and kwargs."""
+    params = {"schema": schema, "date_formats": ingest_date_formats, **kwargs}
+    key = hashlib.sha256(
+        (hash_file(path) + json.dumps(params, sort_keys=True, default=str)).encode()
+    ).hexdigest()
+    return Path(cache_dir, key)
+
+
+def _get_date_col(df: pd.DataFrame, path: Path = None) -> str:
+    """Return raw column name of class date, path is only used in the error message."""
+    date_col = next(
+        (raw for raw, col in map_col.items() if col == "Class Date" and raw in df), None
+    )
+    if date_col is None:
+        raw_cols = [raw for raw, col in map_col.items() if col == "Class Date"]
+        raise ValueError(f"No class date column {raw_cols} in {path or 'df'}")
+    return date_col
+
+
+def _read_parquet(parquet_file: Path) -> pd.DataFrame:
+    """Read cached parquet the way read_excel would return it."""
+    df = pd.read_parquet(parquet_file)
+    # parquet returns missing str as None, read_excel returns NaN
+    for col in df.select_dtypes("object").columns:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def write_atomic(file: Path, write) -> None:
+    """
+        Write file through a temp file in the same folder, then rename it,
+        so that parallel readers never see partial file. Creates the folder.
+
+    Args:
+        file (Path): File to write.
+        write (callable): Takes the temp file path and writes to it, e.g. df.to_parquet.
+    """
+    Path(file.parent).mkdir(parents=True, exist_ok=True)
+    tmp_file = Path(file.parent, f"{file.name}.{os.getpid()}.tmp")
+    write(tmp_file)
+    tmp_file.replace(file)
+
+
+def _write_parquet(df: pd.DataFrame, parquet_file: Path) -> None:
+    """Write df to parquet_file, creating its folder."""
+    write_atomic(parquet_file, lambda tmp_file: df.to_parquet(tmp_file, index=False))
+
+
+def _read_excel_cached(
+    path: Path, cache_file: Path, schema: dict, kwargs: dict
+) -> pd.DataFrame:
+    """Read parquet in cache_file if exists, else parse excel and write it."""
+    parquet_file = cache_file.with_suffix(".parquet")
+    if parquet_file.exists():
+        return _read_parquet(parquet_file)
+
+    if schema is None:
+        df = pd.read_excel(path, **kwargs)
+    else:
+        df = read_excel_with_schema(path, schema=schema, **kwargs)
+    df = _make_parquet_safe(df)
+    _write_parquet(df, parquet_file)
+    return df
+
+
+def read_excel_cached(
+    path: Path, cache_dir: Path = path_cache, schema: dict = ingest_schema, **kwargs
+) -> pd.DataFrame:
+    """
+        Read excel file, caching the parsed df as parquet.
+        Cache key is the hash of file content, schema and read_excel kwargs,
+        so renamed or re-downloaded files with the same content are not parsed again.
+        Delete cache_dir to force reparse.
+
+    Args:
+        path (Path): Excel file.
+        cache_dir (Path, optional): Cache directory. Defaults to path_cache.
+        schema (dict, optional): See read_excel_with_schema. None = read all columns as is.
+        **kwargs: Passed to pd.read_excel.
+
+    Returns:
+        pd.DataFrame
+    """
+    cache_file = _cache_file(path, cache_dir, schema, kwargs)
+    return _read_excel_cached(path, cache_file, schema, kwargs)
+
+
+def read_month_cached(
+    path: Path,
+    month: int = month,
+    is_utc: bool = is_utc,
+    cache_dir: Path = path_cache,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+        Read excel file with ingest_schema, keeping only rows in month.
+        If the cached date range of the file does not contain month,
+        the file is skipped without being read.
+
+    Args:
+        path (Path): Excel file.
+        month (int, optional): Month to keep. Defaults to month.
+        is_utc (bool, optional): True if date is in UTC. Defaults to is_utc.
+        cache_dir (Path, optional): Cache directory. Defaults to path_cache.
+        **kwargs: Passed to pd.read_excel.
+
+    Returns:
+        pd.DataFrame: Rows in month, None if there is no row in month.
+    """
+    cache_file = _cache_file(path, cache_dir, ingest_schema, kwargs)
+    range_file = cache_file.with_suffix(".json")  # min and max class date of the file
+
+    if range_file.exists():
+        date_range = pd.Series(json.loads(range_file.read_text()))
+        if date_range.isna().all():  # file without any class
+            return None
+        dates = convert_to_gmt_plus_7(date_range.to_frame("date"), "date", is_utc)
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        if month not in pd.period_range(dates["min"], dates["max"], freq="M").month:
+            return None
+
+    df = _read_excel_cached(path, cache_file, ingest_schema, kwargs)
+    date_col = _get_date_col(df, path)
+    if not range_file.exists():
+        date_range = {"min": df[date_col].min(), "max": df[date_col].max()}
+        range_json = json.dumps(date_range, default=lambda d: None if pd.isna(d) else d.isoformat())
+        write_atomic(range_file, lambda tmp_file: tmp_file.write_text(range_json))
+
+    dates = convert_to_gmt_plus_7(df, date_col, is_utc)
+    df = df.loc[dates.dt.month == month]
+    return df if len(df) else None
+
+
+def load_raw_data(
+    path_raw_data: Path = path_raw_data,
+    is_mutiple_files: bool = is_mutiple_files,
+    month: int = month,
+    is_utc: bool = is_utc,
+    n_jobs: int = n_jobs,
+    cache_dir: Path = path_cache,
+) -> pd.DataFrame:
+    """
+        Load raw attendance data.
+        Files from Coco are parsed in a process pool, then concatenated in
+        file name order so the result does not depend on which process finish first.
+        Rows outside month are filtered per file before concatenation,
+        and files whose dates are all outside month are skipped.
+
+    Args:
+        path_raw_data (Path, optional): File (data from ken) or folder (data from coco).
+        is_mutiple_files (bool, optional): True if data is in multiple files.
+        month (int, optional): Month to keep. None = keep all rows.
+        is_utc (bool, optional): True if date is in UTC. Defaults to is_utc.
+        n_jobs (int, optional): Number of processes. None = all cores, 1 = no pool.
+        cache_dir (Path, optional): Cache directory. Defaults to path_cache.
+
+    Returns:
+        pd.DataFrame: Raw data.
+    """
+
+    if month is None:
+        read_file = partial(read_excel_cached, cache_dir=cache_dir)
+    else:
+        read_file = partial(
+            read_month_cached, month=month, is_utc=is_utc, cache_dir=cache_dir
+        )
+
+    if not is_mutiple_files:  # data in one file (data from ken)
+        dfs = [read_file(path_raw_data)]
+
+    else:  # data in multiple files (data from coco)
+        files = sorted(Path(path_raw_data).glob("*.xlsx"))
+        read_file = partial(read_file, index_col=None, skiprows=2)
+        if n_jobs == 1:
+            dfs = [read_file(file) for file in files]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                dfs = list(executor.map(read_file, files))
+
+    # note: skipped files are None, pd.concat ignores them
+    if all(df is None for df in dfs):
+        raise ValueError(f"There is no class in month {month} in {path_raw_data}.")
+    return pd.concat(dfs, axis=0, ignore_index=True)
+
+
+def clean_student_name(df: pd.DataFrame) -> pd.DataFrame:
+    """
+        There are students who change name in the middle of month,
+        e.g. "Devan (PP)" to "Devan (KK)".
+        For each code with more than one name, if the first two names are similar,
+        replace all names of that code with the second name.
+        Names are ordered by their first class date (then by name), so the result
+        does not depend on the order of input files or rows.
+        Names are compared in one batch and replaced in one pass, only within the code.
+
+    Args:
+        df (pd.DataFrame): Raw df.
+
+    Returns:
+        pd.DataFrame
+    """
+    # codes with more than one name
+    dup_codes = (df
+        .groupby(["Service Type", "Student Code"])
+        .agg(count=("Student Name", "nunique"))
+        .loc[lambda df_: df_["count"] > 1]
+        .reset_index()
+        ["Student Code"]
+        .unique()
+    )
+    # names of each code, in order of first class date
+    date_col = _get_date_col(df)
+    names = (
+        df.loc[df["Student Code"].isin(dup_codes)]
+        .groupby(["Student Code", "Student Name"], as_index=False)
+        .agg(first_date=(date_col, "min"))
+        .sort_values(["Student Code", "first_date", "Student Name"])
+        .assign(rank=lambda df_: df_.groupby("Student Code").cumcount())
+    )
+    name1 = names.loc[names["rank"] == 0].set_index("Student Code")["Student Name"]
+    name2 = names.loc[names["rank"] == 1].set_index("Student Code")["Student Name"]
+    name1 = name1.loc[name2.index]
+
+    # if the set ratio is more than threshold, change the name to the other
+    # note: token_set_ratio is 0-100, so this only skips names without any common token
+    set_ratios = process.cpdist(
+        name1.values,
+        name2.values,
+        scorer=fuzz.token_set_ratio,
+        processor=utils.default_process,
+        workers=-1,
+    )
+    names_map = name2.loc[set_ratios > 0.75]
+    return df.assign(
+        **{"Student Name": df["Student Code"].map(names_map).fillna(df["Student Name"])}
+    )
+
+
+def map_unique(series: pd.Series, func) -> pd.Series | pd.DataFrame:
+    """
+        Apply func to the distinct values of series only,
+        then map the results back to every row.
+        String columns repeat a lot, so this scales with distinct values, not rows.
+        NaN is kept as a value, so func sees it the same way it would per row.
+
+    Args:
+        series (pd.Series): Column to transform.
+        func (callable): Takes a series of distinct values,
+            returns a series or dataframe of the same length.
+
+    Returns:
+        pd.Series | pd.DataFrame: Result of func for every row of series.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    results = func(pd.Series(uniques, name=series.name))
+    if not isinstance(results, (pd.Series, pd.DataFrame)):
+        results = pd.Series(results, name=series.name)
+    results = results.iloc[codes]
+    results.index = series.index
+    return results
+
+
+def is_shared_account(teachers: pd.Series) -> pd.Series:
+    """
+        Return whether each teacher is a shared Coco account, e.g. "Online 12".
+        Online accounts numbered above 20 are ooolab, not shared.
+
+    Args:
+        teachers (pd.Series): Teacher column.
+
+    Returns:
+        pd.Series: Bool, False for missing teacher.
+    """
+    return map_unique(
+        teachers,
+        lambda teachers_: (
+            teachers_.str.lower().str.contains("online", na=False)
+            & (teachers_.str.extract(r"(\d+)")[0].astype(float) <= 20)
+        ),
+    )
+
+
 def delete_unknown_shared_acc_teacher(df: pd.DataFrame) -> pd.DataFrame:
     # there are blank teacher in shared account, because they are not specified in description
     # so delete the attendance altogether because it is impossible to know who the trainer is
     # except manually checking
-    contains_online = df["Teacher"].str.lower().str.contains("online")
-    lower_than_eq_20 = df["Teacher"].str.extract("(\d+)")[0].astype(float) <= 20
     desc_blank = df["Description"].isna()
-    idxs = df.loc[
-        contains_online 
-        & lower_than_eq_20
-        & desc_blank
-    ].index
-    return df.drop(idxs, axis="index")
+    # keep rows by mask, selecting the deleted rows first would copy them
+    return df.loc[~(is_shared_account(df["Teacher"]) & desc_blank)]
 
 
 def convert_to_gmt_plus_7(
@@ -104,6 +504,25 @@ def create_class_time(df: pd.DataFrame) -> pd.Series:
     return class_time
 
 
+# teachers that are duplicated in coco
+# ! If duplicated, always choose the longest name.
+teacher_name_map = {
+    "Azhar Rahul": "Azhar Rahul Finaya",
+    "Handayani Risma": "Handayani Khaerunisyah Risma",
+    "Kartikasari Prettya": "Kartikasari Prettya Nur",
+    "Ramadhan Ira Ragil": "Ramadhani Ira",
+    "S Allan": "Santiago Allan",
+    "Gandhama Jesita": "Ghandama Jesita",
+    "Istiqomah Diah": "Toluhula Diah Istiqomah",
+    "Putri Tiara": "Setiawan Tiara Putri",
+    "Ratnasari Handayani Hamsah": "Hamsah Handayani Ratnasari",
+    "Hamsah Ratnasari Handayani": "Hamsah Handayani Ratnasari",
+    "Kaleb Arthur Mordechai": "Mordechai Kaleb Arthur",
+    "Mordechai Arthur Kaleb": "Mordechai Kaleb Arthur",
+    "Bushey Michael James": "Bushey James Michael",
+}
+
+
 def clean_teacher_name(df: pd.DataFrame) -> pd.Series:
     """
         Clean teacher name and remove duplicated name.
@@ -116,36 +535,158 @@ def clean_teacher_name(df: pd.DataFrame) -> pd.Series:
         series: Cleaned name.
     """
 
-    teachers = (
-        df["teacher"]
-        .str.replace("\(.*\)", "", regex=True)
-        .str.replace("   ", " ", regex=False)
-        .str.replace("  ", " ", regex=False)
-        .str.strip()
-        .str.title()
-        # replace duplicated names
-        .replace(
-            {
-                "Azhar Rahul": "Azhar Rahul Finaya",
-                "Handayani Risma": "Handayani Khaerunisyah Risma",
-                "Kartikasari Prettya": "Kartikasari Prettya Nur",
-                "Ramadhan Ira Ragil": "Ramadhani Ira",
-                "S Allan": "Santiago Allan",
-                "Gandhama Jesita": "Ghandama Jesita",
-                "Istiqomah Diah": "Toluhula Diah Istiqomah",
-                "Putri Tiara": "Setiawan Tiara Putri",
-                "Ratnasari Handayani Hamsah": "Hamsah Handayani Ratnasari",
-                "Hamsah Ratnasari Handayani": "Hamsah Handayani Ratnasari",
-                "Kaleb Arthur Mordechai": "Mordechai Kaleb Arthur",
-                "Mordechai Arthur Kaleb": "Mordechai Kaleb Arthur",
-                "Bushey Michael James": "Bushey James Michael",
-            }
-        )
+    teachers = map_unique(
+        df["teacher"],
+        lambda teachers: (
+            teachers
+            .str.replace("\(.*\)", "", regex=True)
+            .str.replace("   ", " ", regex=False)
+            .str.replace("  ", " ", regex=False)
+            .str.strip()
+            .str.title()
+            # replace duplicated names
+            .replace(teacher_name_map)
+        ),
     )
     return teachers
 
 
-def create_class_mode(df: pd.DataFrame) -> pd.Series:
+# rule tables
+# each classifier is a list of (condition, label) rules, the first matching rule wins
+# condition is a tuple of predicate names that must all be true, "~" negates a predicate
+# predicates are computed once per frame by RuleContext and shared between classifiers
+
+
+def _name_contains(df: pd.DataFrame, pat: str) -> pd.Series:
+    return map_unique(
+        df["student_name"],
+        lambda names: names.str.upper().str.contains(pat, regex=False, na=False),
+    )
+
+
+def _description_contains(df: pd.DataFrame, pat: str, **kwargs) -> pd.Series:
+    return map_unique(
+        df["class_description"],
+        lambda descriptions: descriptions.astype(str).str.lower().str.contains(pat, **kwargs),
+    )
+
+
+predicates = {
+    # student
+    "student_goc": lambda df: df["student_center"] == "Global Online Center",
+    "membership_standard": lambda df: df["student_membership"] == "Standard",
+    "membership_vip": lambda df: df["student_membership"] == "VIP",
+    "name_dlx": partial(_name_contains, pat="(DLX"),
+    "name_go": partial(_name_contains, pat="(GO"),
+    "name_dekki": partial(_name_contains, pat="DEKKI"),
+    "code_8184": lambda df: map_unique(
+        df["student_code"],
+        lambda codes: codes.astype(str).str.contains("8184", regex=False, na=False),
+    ),
+    # teacher
+    "teacher_international": lambda df: df["teacher_center"] == "International",
+    "teacher_daniel": lambda df: df["teacher"] == "Bradshaw Daniel",
+    "teacher_jason": lambda df: df["teacher"] == "Gereau Jason Jarett",
+    # class mode
+    "online": lambda df: df["class_mode"] == "Online",
+    "offline": lambda df: df["class_mode"] == "Offline",
+    "class_mode_goc": lambda df: df["class_mode"] == "GOC",
+    # class type
+    "class_type_online": lambda df: map_unique(
+        df["class_type"],
+        lambda class_types: class_types.str.lower().str.contains("online", regex=False, na=False),
+    ),
+    "online_welcome": lambda df: df["class_type"] == "Online Welcome",
+    "online_advising": lambda df: df["class_type"] == "Online Advising Session",
+    "advising": lambda df: df["class_type"] == "Advising Session",
+    "first_lesson": lambda df: df["class_type"] == "First Lesson",
+    "social_club": lambda df: df["class_type"] == "Social Club",
+    "online_encounter": lambda df: df["class_type"] == "Online Encounter",
+    # class description
+    "vpg": partial(_description_contains, pat="vpg", na=False),
+    "chat_hour": partial(_description_contains, pat="chat hour", regex=False),
+    "community": lambda df: map_unique(
+        df["class_description"],
+        lambda descriptions: (
+            descriptions
+            .str.lower()
+            .str.contains("cre-8|cre 8|cre8|syndicate|re-charge|re charge|recharge|leap")
+        ),
+    ),
+    "no_location_in_description": lambda df: map_unique(
+        df["class_description"],
+        lambda descriptions: (
+            (descriptions.str.contains("@") == False)
+            & (descriptions.str.contains(" at ") == False)
+        ),
+    ),
+    # class date
+    "saturday": lambda df: df["class_date"].dt.day_name().isin(["Saturday"]),
+    "thursday_or_saturday": lambda df: df["class_date"].dt.day_name().isin(["Thursday", "Saturday"]),
+    # session members
+    "only_vip": lambda df: (df["class_member_deluxe"] + df["class_member_go"]) == 0,
+}
+
+
+class RuleContext:
+    """
+        Predicates of one frame, each computed at most once.
+        Pass the same context to classifiers that run on the same frame
+        so they share masks instead of recomputing them.
+    """
+
+    def __init__(self, df: pd.DataFrame, predicates: dict = predicates):
+        self.df = df
+        self.predicates = predicates
+        self.masks = {}
+
+    def __getitem__(self, name: str) -> pd.Series:
+        if name not in self.masks:
+            if name.startswith("~"):
+                self.masks[name] = ~self[name[1:]]
+            else:
+                self.masks[name] = self.predicates[name](self.df)
+        return self.masks[name]
+
+    def condition(self, names: tuple) -> pd.Series:
+        """Return mask where all predicates in names are true."""
+        mask = pd.Series(True, index=self.df.index)
+        for name in names:
+            mask = mask & self[name]
+        return mask
+
+
+def apply_rules(context: RuleContext, rules: list, default="Error") -> np.ndarray:
+    """
+        Label each row with the first rule whose condition is true.
+
+    Args:
+        context (RuleContext): Predicates of the frame to classify.
+        rules (list): List of (condition, label).
+        default (optional): Label if no rule matches. Defaults to "Error".
+
+    Returns:
+        np.ndarray: Labels.
+    """
+    return np.select(
+        condlist=[context.condition(condition) for condition, _ in rules],
+        choicelist=[label for _, label in rules],
+        default=default,
+    )
+
+
+class_mode_rules = [
+    # GOC
+    (("student_goc",), "GOC"),
+    (("teacher_international",), "GOC"),
+    # if class name container "online" then online class
+    (("class_type_online",), "Online"),
+    # else, offline class
+    ((), "Offline"),
+]
+
+
+def create_class_mode(df: pd.DataFrame, context: RuleContext = None) -> pd.Series:
     """
         Create class mode either offline or online.
         If class contains string 'online', then class_mode = 'Online'.
@@ -153,22 +694,13 @@ def create_class_mode(df: pd.DataFrame) -> pd.Series:
 
     Args:
         df (pd.DataFrame)
+        context (RuleContext, optional): Shared predicates of df. Defaults to None.
 
     Returns:
         series: class_mode
     """
-    conditions = [
-        # GOC
-        df["student_center"] == "Global Online Center",
-        df["teacher_center"] == "International",
-        # if class name container "online" then online class
-        df["class_type"].str.lower().str.contains("online", regex=False, na=False),
-        # else, offline class
-        True,
-    ]
-    choices = ["GOC", "GOC", "Online", "Offline"]
-
-    classes = np.select(conditions, choices, default="Error")
+    context = context or RuleContext(df)
+    classes = apply_rules(context, class_mode_rules)
     return classes
 
 
@@ -196,7 +728,18 @@ def create_student_code(df: pd.DataFrame) -> pd.Series:
     return df["student_membership"] + " " + df["student_code"].astype(int).astype("str")
 
 
-def create_student_membership(df: pd.DataFrame) -> pd.Series:
+student_membership_rules = [
+    # mar 2024
+    # there is one vip members who are incorrectly assigned into deluxe
+    (("name_dekki", "code_8184"), "VIP"),
+    (("name_go",), "GO"),  # if name contains go then go member
+    (("~name_go", "membership_standard"), "Deluxe"),  # if name not contain go and membership contains dlx then dlx
+    (("~name_go", "name_dlx"), "Deluxe"),  # if name not contain go and name contains dlx then dlx
+    (("membership_vip",), "VIP"),  # if membership contains VIP
+]
+
+
+def create_student_membership(df: pd.DataFrame, context: RuleContext = None) -> pd.Series:
     """
         Create series marking student membership type.
         Standard Deluxe can join online and offline class.
@@ -205,37 +748,13 @@ def create_student_membership(df: pd.DataFrame) -> pd.Series:
 
     Args:
         df (pd.DataFrame)
+        context (RuleContext, optional): Shared predicates of df. Defaults to None.
 
     Returns:
         memberships
     """
-    membership_contains_std = df["student_membership"] == "Standard"
-    membership_contains_vip = df["student_membership"] == "VIP"
-    name_contains_dlx = (
-        df["student_name"].str.upper().str.contains("(DLX", regex=False, na=False)
-    )
-    name_contains_go = (
-        df["student_name"].str.upper().str.contains("(GO", regex=False, na=False)
-    )
-    mask_deluxe_1 = (~name_contains_go) & membership_contains_std
-    mask_deluxe_2 = (~name_contains_go) & name_contains_dlx
-
-    # mar 2024
-    # there is one vip members who are incorrectly assigned into deluxe
-    name_dekki = (
-        df["student_name"].str.upper().str.contains("DEKKI", regex=False, na=False)
-    )
-    code_8184 = df["student_code"].astype(str).str.contains("8184", regex=False, na=False)
-
-    conditions = [
-        (name_dekki & code_8184),
-        name_contains_go,  # if name contains go then go member
-        mask_deluxe_1,  # if name not contain go and membership contains dlx then dlx
-        mask_deluxe_2,  # if name not contain go and name contains dlx then dlx
-        membership_contains_vip,  # if membership contains VIP
-    ]
-    choices = ["VIP", "GO", "Deluxe", "Deluxe", "VIP"]
-    memberships = np.select(conditions, choices, default="Error")
+    context = context or RuleContext(df)
+    memberships = apply_rules(context, student_membership_rules)
 
     return memberships
 
@@ -265,6 +784,60 @@ def create_duration(df: pd.DataFrame) -> pd.Series:
     return durations
 
 
+trainer_columns = [
+    "coco_teacher_name",
+    "teacher_center",
+    "teacher_area",
+    "teacher_position",
+]
+# rosters already loaded in this process, keyed by path, mtime and size
+_trainer_rosters = {}
+
+
+def load_trainer_roster(
+    path_trainer_data: Path = path_trainer_data, cache_dir: Path = path_cache
+) -> pd.DataFrame:
+    """
+        Trainer roster of all months, parsed from the trainer workbook in one pass.
+        Sheets without the trainer columns are ignored.
+        The roster is cached as parquet keyed by the hash of the workbook,
+        and kept in memory until the workbook mtime or size changes.
+
+    Args:
+        path_trainer_data (Path, optional): Trainer workbook. Defaults to path_trainer_data.
+        cache_dir (Path, optional): Cache directory. Defaults to path_cache.
+
+    Returns:
+        pd.DataFrame: Roster indexed by (sheet, coco_teacher_name).
+    """
+    stat = os.stat(path_trainer_data)
+    key = (str(path_trainer_data), stat.st_mtime_ns, stat.st_size)
+    if key in _trainer_rosters:
+        return _trainer_rosters[key]
+
+    parquet_file = Path(
+        cache_dir, "trainer-" + hash_obj([hash_file(path_trainer_data), trainer_columns])
+    ).with_suffix(".parquet")
+    if parquet_file.exists():
+        df_roster = _read_parquet(parquet_file)
+    else:
+        sheets = pd.read_excel(path_trainer_data, sheet_name=None)  # all sheets
+        df_roster = pd.concat(
+            [
+                df_sheet[trainer_columns].assign(sheet=str(sheet_name))
+                for sheet_name, df_sheet in sheets.items()
+                if set(trainer_columns) <= set(df_sheet.columns)
+            ],
+            ignore_index=True,
+        )
+        df_roster = _make_parquet_safe(df_roster)
+        _write_parquet(df_roster, parquet_file)
+
+    df_roster = df_roster.set_index(["sheet", "coco_teacher_name"]).sort_index()
+    _trainer_rosters[key] = df_roster
+    return df_roster
+
+
 def load_df_teacher(df_teacher_sheet_name: str = df_teacher_sheet_name) -> pd.DataFrame:
     """
         Teacher df to get teacher center and area
@@ -275,21 +848,81 @@ def load_df_teacher(df_teacher_sheet_name: str = df_teacher_sheet_name) -> pd.Da
     Returns:
         pd.DataFrame
     """
-    df_teacher = pd.read_excel(
-        io=path_trainer_data,
-        sheet_name=df_teacher_sheet_name,
-        usecols=[
-            "coco_teacher_name",
-            "teacher_center",
-            "teacher_area",
-            "teacher_position",
-        ],
-    )
+    df_roster = load_trainer_roster(path_trainer_data, path_cache)
+    if df_teacher_sheet_name not in df_roster.index.get_level_values("sheet"):
+        raise ValueError(f"There is no sheet {df_teacher_sheet_name} in {path_trainer_data}.")
+    df_teacher = df_roster.loc[df_teacher_sheet_name].reset_index()[trainer_columns]
     return df_teacher
 
 
+# "@" followed by these is not class location, e.g. "@3pm", "@the", "@work"
+# ! order matters, e.g. "is" must be before "i"
+location_noise = [
+    "hour",
+    r"\d",
+    "paddington",
+    "conversationalists",
+    "is",
+    "the",
+    "to",
+    "these",
+    "work",
+    "would",
+    "complaining",
+    "i",
+    "wse",
+    "pancar",
+    "haris",
+    "harris",
+    "a",
+    "do",
+    "padingtton",
+]
+location_noise_pattern = re.compile("@(?:" + "|".join(location_noise) + ")")
+# longest alias first, so that "gandaira city" is matched before "gandaira"
+center_alias_pattern = re.compile(
+    "|".join(
+        re.escape(alias)
+        for alias in sorted(center_map.get_center_alias(), key=len, reverse=True)
+    )
+)
+
+
+def extract_class_location(description: str) -> str:
+    """
+        Extract class location from one class description,
+        e.g. "vpg - at pacific place" -> "PP".
+        If there is no location after "@" or " at ", class is online.
+
+    Args:
+        description (str): Lowercase class description.
+
+    Returns:
+        str: Class location.
+    """
+    if not isinstance(description, str):
+        return "Online"
+    description = (
+        description
+        .replace(" at ", " @")  # replace at with @
+        .replace("@ ", "@")  # remove space after at
+        .replace("@ work", "at work")  # remove @ for recharge class
+    )
+    # remove @ for time and other odd value
+    description = location_noise_pattern.sub("at other", description)
+    # replace center name with center code
+    description = center_alias_pattern.sub(
+        lambda m: center_map.get_center_alias()[m.group()].lower(), description
+    )
+    location = re.search(r"@(\w*)", description)
+    if location is None or location.group(1) == "":
+        return "Online"
+    return location.group(1).upper()
+
+
 def create_class_location_1(df: pd.DataFrame) -> pd.Series:
-    """create class location from description
+    """create class location from description.
+    Descriptions repeat a lot, so each distinct description is evaluated once.
 
     Args:
         df (dataframe)
@@ -298,45 +931,9 @@ def create_class_location_1(df: pd.DataFrame) -> pd.Series:
         series: class location
     """
 
-    class_locations = (
-        df.loc[:, "class_description"]
-        .str.lower()
-        .str.replace(" at ", " @", regex=False)  # replace at with @
-        # .str.replace('at ', ' @', regex= False) # replace at with @
-        .str.replace("@ ", "@", regex=False)  # remove space after at
-        .str.replace("@ work", "at work", regex=False)  # remove @ for recharge class
-        .str.replace("@hour", "at time", regex=False)  # remove @ for time
-        .str.replace("(@\d)", "at time", regex=True)  # remove @ for time
-        # replace other odd value
-        .str.replace(
-            "@paddington|@conversationalists|@is|@the|@to|@these|@work|@would|@complaining",
-            "at other",
-            regex=True,
-        )
-        .str.replace(
-            "@i|@wse|@pancar|@haris|@harris|@a|@paddington|@do|@padingtton",
-            "at other",
-            regex=True,
-        )
-        .str.replace("pacific place", "pp", regex=False)
-        .str.replace("sedayu city", "sdc", regex=False)
-        .str.replace("kelapa gading", "kg", regex=False)
-        .str.replace("gandaria city", "gc", regex=False)
-        .str.replace("gandaira city", "gc", regex=False)
-        .str.replace("gandaira", "gc", regex=False)
-        .str.replace("living world", "lw", regex=False)
-        .str.replace("tb simatupang", "tbs", regex=False)
-        .str.replace("simatupang", "tbs", regex=False)
-        .str.replace("kota kasablanka", "kk", regex=False)
-        .str.replace("kokas", "kk", regex=False)
-        .str.replace("cibubur", "cbb", regex=False)
-        .str.replace("pakuwon", "pkw", regex=False)
-        .str.replace("dago", "dg", regex=False)
-        .str.extract("(@\w*)")
-        .replace("@", np.nan)[0]
-        .str.replace("@", "")
-        .str.upper()
-        .fillna("Online")
+    class_locations = map_unique(
+        df["class_description"],
+        lambda descriptions: descriptions.str.lower().map(extract_class_location),
     )
     return class_locations
 
@@ -362,44 +959,32 @@ def create_class_location_2(df: pd.DataFrame) -> pd.Series:
     return class_locations
 
 
-def create_class_location_3(df: pd.DataFrame, month=month) -> pd.Series:
+class_location_3_rules = [
+    # daniel sat PP -> SDC
+    (("teacher_daniel", "offline", "saturday", "no_location_in_description"), "SDC"),
+    # jason thu sat SDC -> PP
+    (("teacher_jason", "offline", "thursday_or_saturday", "no_location_in_description"), "PP"),
+]
+
+
+def create_class_location_3(
+    df: pd.DataFrame, month=month, context: RuleContext = None
+) -> pd.Series:
     """create class location for moving ET.
     # ! Currently unused.
 
     Args:
         df (dataframe)
+        context (RuleContext, optional): Shared predicates of df. Defaults to None.
 
     Returns:
         series: class location
     """
 
-    # daniel sat PP -> SDC
-    # jason thu sat SDC -> PP
-    mask_daniel = (
-        (df["teacher"] == "Bradshaw Daniel")
-        & (df["class_mode"] == "Offline")  # daniel
-        & (df["class_date"].dt.day_name().isin(["Saturday"]))  # offline class
-        & (df["class_description"].str.contains("@") == False)  # saturday
-        & (  # no class loc description
-            df["class_description"].str.contains(" at ") == False
-        )
-    )
-    mask_jason = (
-        (df["teacher"] == "Gereau Jason Jarett")
-        & (df["class_mode"] == "Offline")  # jason
-        & (  # offline class
-            df["class_date"].dt.day_name().isin(["Thursday", "Saturday"])
-        )
-        & (df["class_description"].str.contains("@") == False)  # thu and sat
-        & (  # no class loc description
-            df["class_description"].str.contains(" at ") == False
-        )
-    )
     if (month == 10) | (month == 11) | (month == 12) | (month == 1) | (month == 2):
-        class_locations = np.select(
-            condlist=[mask_daniel, mask_jason],
-            choicelist=["SDC", "PP"],
-            default=df["class_location"],
+        context = context or RuleContext(df)
+        class_locations = apply_rules(
+            context, class_location_3_rules, default=df["class_location"]
         )
     else:
         class_locations = df["class_location"]
@@ -422,6 +1007,10 @@ def assert_class_location_online(df: pd.DataFrame) -> pd.Series:
     return class_locations
 
 
+# areas of class location, location of other areas (e.g. Corporate) is an error
+class_location_areas = ["JKT 1", "JKT 2", "JKT 3", "BDG", "SBY", "HO"]
+
+
 def create_class_location_area(df: pd.DataFrame) -> pd.Series:
     """Group class location per area
 
@@ -429,100 +1018,98 @@ def create_class_location_area(df: pd.DataFrame) -> pd.Series:
         df (pd.DataFrame)
 
     Returns:
-        pd.Series
+        pd.Series: Categorical area.
     """
 
-    class_location_area = np.select(
-        condlist=[
-            df["class_location"].isin(center_map.lookup_centers("JKT 1")),
-            df["class_location"].isin(center_map.lookup_centers("JKT 2")),
-            df["class_location"].isin(center_map.lookup_centers("JKT 3")),
-            df["class_location"].isin(center_map.lookup_centers("BDG")),
-            df["class_location"].isin(center_map.lookup_centers("SBY")),
-            df["class_location"] == "Online",
-            df["class_location"] == "HO",
-        ],
-        choicelist=["JKT 1", "JKT 2", "JKT 3", "BDG", "SBY", "Online", "HO"],
+    class_location_area = center_map.map_areas(
+        df["class_location"],
+        areas=class_location_areas,
+        other={"Online": "Online"},
         default="Error",
     )
     return class_location_area
 
 
-def create_class_service(df: pd.DataFrame) -> pd.Series:
+# assumes that one teacher can only teach one class at a time
+session_key = ["teacher", "class_date", "class_time", "class_type"]
+
+
+def create_session(df: pd.DataFrame) -> pd.DataFrame:
     """
-        If class does not contain non-VIP, then it is a VIP class
-        If class contains non-VIP and offline, then it is a deluxe class
-        If class contains non-VIP and online, then it is a deluxe + go class
+        Aggregate df_clean into one row per session (session_key).
+        Session columns are taken from the first student,
+        sorted by membership, then bookings, attendance and members
+        of each membership are counted per session.
 
     Args:
-        df (pd.DataFrame)
+        df (pd.DataFrame): df_clean
 
     Returns:
-        series: class_service
+        pd.DataFrame: One row per session.
     """
-
-    contains_vip = (
-        df["student_membership_grouped"]
-        .astype(str)
-        .str.contains("VIP", na=False, regex=False)
+    df = df.sort_values(["teacher", "class_date", "class_time", "student_membership"])
+    # session id is numbered in order of first appearance
+    session_id = df.groupby(session_key, sort=False, dropna=False, observed=True).ngroup()
+    counts = (
+        pd.DataFrame(
+            {
+                # the number of people who books this class
+                "class_booking": 1,
+                # the number of people who actually attend
+                "class_attendance": df["student_attendance"] == "Attend",
+                # the number of members of each membership
+                "class_member_vip": df["student_membership"] == "VIP",
+                "class_member_deluxe": df["student_membership"] == "Deluxe",
+                "class_member_go": df["student_membership"] == "GO",
+            },
+            index=df.index,
+        )
+        .groupby(session_id.values)
+        .sum()
     )
-    contains_non_vip = (
-        df["student_membership_grouped"]
-        .astype(str)
-        .str.contains("Deluxe", na=False, regex=False)
-    ) | (
-        df["student_membership_grouped"]
-        .astype(str)
-        .str.contains("GO", na=False, regex=False)
+    return (
+        df.loc[~session_id.duplicated()]
+        # ! drop column unique to student
+        .drop(
+            columns=[
+                "student_attendance",
+                "student_center",
+                "student_code",
+                "student_name",
+                "student_membership",
+                "index",
+            ]
+        )
+        .assign(**{col: counts[col].values for col in counts.columns})
     )
-    online = df["class_mode"] == "Online"
-    offline = df["class_mode"] == "Offline"
-    class_mode_goc = df["class_mode"] == "GOC"
-    teacher_center_int = df["teacher_center"] == "International"
-
-    conditions = [
-        ~contains_non_vip,  # does not contain non vip -> vip
-        (contains_non_vip & offline),  # non-vip & offline -> deluxe
-        (contains_non_vip & online),  # non-vip & online -> deluxe and go
-        (class_mode_goc | teacher_center_int),
-    ]
-    choices = ["VIP", "Deluxe", "Deluxe & Go", "Deluxe & Go"]
-    class_service = np.select(conditions, choices, default="Error")
-    return class_service
 
 
-def create_class_attendance(df: pd.DataFrame) -> pd.Series:
-    """
-        Count the number of students who attend.
+class_service_rules = [
+    (("only_vip",), "VIP"),  # does not contain non vip -> vip
+    (("~only_vip", "offline"), "Deluxe"),  # non-vip & offline -> deluxe
+    (("~only_vip", "online"), "Deluxe & Go"),  # non-vip & online -> deluxe and go
+    (("class_mode_goc",), "Deluxe & Go"),
+    (("teacher_international",), "Deluxe & Go"),
+]
 
-    Args:
-        df (pd.DataFrame)
 
-    Returns:
-        series: class_attendance
+def create_class_service(df: pd.DataFrame, context: RuleContext = None) -> pd.Series:
     """
-
-    class_attendance = (
-        df["student_attendance_grouped"]
-        .astype(str)
-        .str.replace("Not Attend", "Not", regex=False)
-        .str.count("Attend")
-    )
-    return class_attendance
-
-
-def create_class_booking(df: pd.DataFrame) -> pd.Series:
-    """Count the number of members who booked the class.
+        If class does not contain non-VIP, then it is a VIP class
+        If class contains non-VIP and offline, then it is a deluxe class
+        If class contains non-VIP and online, then it is a deluxe + go class
 
     Args:
         df (pd.DataFrame)
+        context (RuleContext, optional): Shared predicates of df. Defaults to None.
 
     Returns:
-        series: class_bookings
+        series: class_service
     """
 
-    class_booking = df["student_attendance_grouped"].astype(str).str.count(",") + 1
-    return class_booking
+    context = context or RuleContext(df)
+    class_service = apply_rules(context, class_service_rules)
+    return class_service
 
 
 def create_class_status(df: pd.DataFrame) -> pd.Series:
@@ -539,7 +1126,24 @@ def create_class_status(df: pd.DataFrame) -> pd.Series:
     return class_status
 
 
-def create_class_type_grouped(df: pd.DataFrame) -> pd.Series:
+class_type_grouped_rules = [
+    (("only_vip", "vpg", "offline"), "VPG"),  # offline vpg
+    (("only_vip", "vpg", "online"), "Online VPG"),  # online vpg
+    (("only_vip", "~vpg", "offline"), "One-on-one"),  # offline 1 1
+    (("only_vip", "~vpg", "online"), "Online One-on-one"),  # online 1 1
+    (("online_welcome",), "Online First Lesson"),
+    (("online_advising",), "Online Advising Session"),
+    (("advising",), "Advising Session"),
+    (("first_lesson",), "First Lesson"),
+    (("offline", "community"), "Community"),  # offline comm
+    (("online", "community"), "Online Community"),  # online comm
+    (("offline", "chat_hour", "social_club"), "Chat Hour"),  # offline ch
+    (("online", "chat_hour", "social_club"), "Online Chat Hour"),  # online ch
+    (("only_vip", "teacher_international", "online_encounter"), "GOC"),  # GOC VIP
+]
+
+
+def create_class_type_grouped(df: pd.DataFrame, context: RuleContext = None) -> pd.Series:
     """
         Convert class type for VIP members to VIP format.
         VIP should only have 2 types of classes: 1:1, VPG.
@@ -548,86 +1152,14 @@ def create_class_type_grouped(df: pd.DataFrame) -> pd.Series:
 
     Args:
         df (pd.DataFrame)
+        context (RuleContext, optional): Shared predicates of df. Defaults to None.
 
     Returns:
         pd.Series: class_type_vip
     """
 
-    # online and offline class
-    online = df["class_mode"] == "Online"
-    offline = df["class_mode"] == "Offline"
-
-    # class contains only vip members
-    only_vip = ~(
-        df["student_membership_grouped"]
-        .astype(str)
-        .str.contains("Deluxe|GO", regex=True, na=False)
-    )
-
-    # class description contains vpg
-    vpg = df["class_description"].astype(str).str.lower().str.contains("vpg", na=False)
-
-    online_wel = df["class_type"] == "Online Welcome"
-    online_adv = df["class_type"] == "Online Advising Session"
-    adv = df["class_type"] == "Advising Session"
-    fl = df["class_type"] == "First Lesson"
-
-    # chat hour
-    chat_hour = (
-        df["class_description"]
-        .astype(str)
-        .str.lower()
-        .str.contains("chat hour", regex=False)
-    )
-    # sc
-    social_club = df["class_type"] == "Social Club"
-
-    # community class
-    community = (
-        df["class_description"]
-        .str.lower()
-        .str.contains("cre-8|cre 8|cre8|syndicate|re-charge|re charge|recharge|leap")
-    )
-
-    # teacher center = international
-    international = df["teacher_center"] == "International"
-
-    # online encounter
-    online_enc = df["class_type"] == "Online Encounter"
-
-    class_type_vip = np.select(
-        condlist=[
-            (only_vip & vpg & offline),  # offline vpg
-            (only_vip & vpg & online),  # online vpg
-            (only_vip & ~vpg & offline),  # offline 1 1
-            (only_vip & ~vpg & online),  # online 1 1
-            (online_wel),
-            (online_adv),
-            (adv),
-            (fl),
-            (offline & community),  # offline comm
-            (online & community),  # online comm
-            (offline & chat_hour & social_club),  # offline ch
-            (online & chat_hour & social_club),  # online ch
-            (only_vip & international & online_enc),  # GOC VIP
-        ],
-        choicelist=[
-            "VPG",
-            "Online VPG",
-            "One-on-one",
-            "Online One-on-one",
-            "Online First Lesson",
-            "Online Advising Session",
-            "Advising Session",
-            "First Lesson",
-            "Community",
-            "Online Community",
-            "Chat Hour",
-            "Online Chat Hour",
-            "GOC",
-        ],
-        default=df["class_type"],
-    )
+    context = context or RuleContext(df)
+    class_type_vip = apply_rules(context, class_type_grouped_rules, default=df["class_type"])
     return class_type_vip
 
 
@@ -771,21 +1303,20 @@ def clean_shared_account_et(df: pd.DataFrame):
         pd.Series: Mapped ET name for these classes.
     """
 
-    contains_online = df["teacher"].str.lower().str.contains("online")
-    lower_than_eq_20 = df["teacher"].str.extract("(\d+)")[0].astype(float) <= 20  # non-ooolab
-    more_than_20 = df["teacher"].str.extract("(\d+)")[0].astype(float) > 20  # ooolab
-
     conditions = [
-        (contains_online & lower_than_eq_20),
+        is_shared_account(df["teacher"]),
     ]
     choices = [
-        (
-            df["class_description"]
-            .str.split("-")
-            .str[-1]
-            .str.strip()
-            .str.lower()
-            .map(shared_acc_et_map)
+        map_unique(
+            df["class_description"],
+            lambda descriptions: (
+                descriptions
+                .str.split("-")
+                .str[-1]
+                .str.strip()
+                .str.lower()
+                .map(shared_acc_et_map)
+            ),
         ),
     ]
     return np.select(conditions, choices, default=df["teacher"])
@@ -824,4 +1355,81 @@ class_grouping = {
     "IELTS First Lesson": "Other",
     "Proskill First Lesson": "Other",
     "Mock Test": "Other",
-}
\ No newline at end of file
+}
+
+
+# dtype of df_clean and df_session columns after compact_dtypes, columns not here are kept.
+# str with few distinct values -> category (student_code and student_name repeat
+# once per class of the student, so they are also much smaller as category),
+# counts -> int16, hours -> float32, index -> int32.
+# class_date is kept as datetime64 (date only), time of class is class_time (ordered category)
+compact_dtype_map = {
+    "class_area": "category",
+    "class_attendance": "int16",
+    "class_booking": "int16",
+    "class_description": "category",
+    "class_duration": "float32",
+    "class_grouping": "category",
+    "class_location": "category",
+    "class_mode": "category",
+    "class_service": "category",
+    "class_status": "category",
+    "class_type": "category",
+    "class_type_grouped": "category",
+    "coco_teacher_name": "category",
+    "index": "int32",
+    "student_attendance": "category",
+    "student_center": "category",
+    "student_code": "category",
+    "student_membership": "category",
+    "student_name": "category",
+    "teacher": "category",
+    "teacher_area": "category",
+    "teacher_center": "category",
+    "teacher_position": "category",
+}
+
+
+def compact_dtypes(df: pd.DataFrame, dtypes: dict = compact_dtype_map) -> pd.DataFrame:
+    """
+        Convert columns of df to the smaller dtypes in dtypes.
+        Columns that are not in df are skipped.
+
+    Args:
+        df (pd.DataFrame): df_clean or df_session.
+        dtypes (dict, optional): Defaults to compact_dtype_map.
+
+    Returns:
+        pd.DataFrame: df with compact dtypes.
+    """
+    dtypes = {col: dtype for col, dtype in dtypes.items() if col in df.columns}
+    for col, dtype in dtypes.items():
+        # astype does not check overflow of int
+        if pd.api.types.is_integer_dtype(dtype) and len(df) > 0:
+            info = np.iinfo(dtype)
+            if df[col].min() < info.min or df[col].max() > info.max:
+                raise ValueError(f"{col} does not fit in {dtype}")
+    return df.astype(dtypes)
+
+
+def hash_mappings() -> dict:
+    """Return hash of each mapping table, used to detect months that need rebuild."""
+    return {
+        "shared_acc_et_map": hash_obj(shared_acc_et_map),
+        "class_grouping": hash_obj(class_grouping),
+        "teacher_name_map": hash_obj(teacher_name_map),
+        "center_map": hash_obj(center_map.get_center_area_map()),
+        "center_alias": hash_obj(center_map.get_center_alias()),
+        "location_noise": hash_obj(location_noise),
+        "compact_dtype_map": hash_obj(compact_dtype_map),
+        "rules": hash_obj(
+            [
+                class_mode_rules,
+                student_membership_rules,
+                class_location_3_rules,
+                class_location_areas,
+                class_service_rules,
+                class_type_grouped_rules,
+            ]
+        ),
+    }
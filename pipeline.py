@@ -0,0 +1,990 @@
+"""
+Run the whole pipeline headless: load, df_clean, df_session, test and save.
+
+Usage:
+    python -m pipeline --year 2024 --month 5
+    python -m pipeline --start 2023-01 --end 2024-05 --workers 8  # backfill
+"""
+
+import argparse
+import inspect
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+import xlsxwriter
+
+import backend
+import config
+import module
+import store
+import validation
+
+
+def get_path_raw_data(year: int, month: int) -> Path:
+    """Return input/{year}/{year}-{month} folder."""
+    return Path("input", str(year), f"{year}-{month:02d}")
+
+
+def get_output_folder(year: int, month: int) -> Path:
+    """Return output/{year}/{year}-{month} folder."""
+    return Path("output", str(year), f"{year}-{month:02d}")
+
+
+def get_output_files(year: int, month: int, output_format: str = "xlsx") -> tuple:
+    """Return path of session and attendance output files, output_format = xlsx or parquet."""
+    output_folder = get_output_folder(year, month)
+    session_filepath = Path(output_folder, f"data-session-{year}-{month:02d}.{output_format}")
+    att_filepath = Path(output_folder, f"data-attendance-{year}-{month:02d}.{output_format}")
+    return session_filepath, att_filepath
+
+
+def get_manifest(
+    path_raw_data: Path, is_mutiple_files: bool, df_teacher_sheet_name: str
+) -> dict:
+    """
+        Hash everything that determines the output of a month:
+        input files, trainer sheet and mapping tables in module.py.
+
+    Args:
+        path_raw_data (Path): File or folder.
+        is_mutiple_files (bool): True if data is in multiple files.
+        df_teacher_sheet_name (str): Sheet name in trainer data.
+
+    Returns:
+        dict: Manifest of the month.
+    """
+    if is_mutiple_files:
+        files = sorted(Path(path_raw_data).glob("*.xlsx"))
+    else:
+        files = [Path(path_raw_data)]
+    return {
+        "inputs": {file.name: module.hash_file(file) for file in files},
+        "trainer_sheet": module.hash_df(module.load_df_teacher(df_teacher_sheet_name)),
+        "mappings": module.hash_mappings(),
+    }
+
+
+def _memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def _run_stage(df: pd.DataFrame, name: str, func, profile: list = None) -> pd.DataFrame:
+    """Run one stage, appending its time, rows and memory to profile if not None."""
+    if profile is None:
+        return func(df)
+
+    rows_in, mb_in = len(df), _memory_mb(df)
+    start = time.perf_counter()
+    df = func(df)
+    seconds = time.perf_counter() - start
+    mb_out = _memory_mb(df)
+    profile.append(
+        {
+            "stage": name,
+            "source": "run",
+            "seconds": round(seconds, 4),
+            "rows_in": rows_in,
+            "rows_out": len(df),
+            "mb_in": round(mb_in, 2),
+            "mb_out": round(mb_out, 2),
+            "mb_delta": round(mb_out - mb_in, 2),
+        }
+    )
+    return df
+
+
+def run_stages(
+    df: pd.DataFrame,
+    stages: list,
+    path_checkpoint: Path = config.path_checkpoint,
+    profile: list = None,
+) -> pd.DataFrame:
+    """
+        Run stages in order, each stage is (name, function, dependencies).
+        Output of each stage is saved in path_checkpoint, keyed by the hash of input df
+        and the code and dependencies of that stage and all stages before it.
+        Code includes the helpers and tables of this repo the stage refers to, see _fingerprint.
+        If a stage or its mapping changes, only that stage and the stages after it are rerun.
+        Checkpoints unused for config.checkpoint_max_age_days are deleted.
+
+    Args:
+        df (pd.DataFrame): Input of the first stage.
+        stages (list): [(name, function, dependencies)].
+        path_checkpoint (Path, optional): None = no checkpoint. Defaults to config.path_checkpoint.
+        profile (list, optional): If not None, time, rows and memory of each stage
+            are appended to it. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Output of the last stage.
+    """
+    if path_checkpoint is None:
+        for name, func, deps in stages:
+            df = _run_stage(df, name, func, profile)
+        return df
+
+    # checkpoint key of each stage is chained from the previous stage
+    key = module.hash_df(df)
+    files = []
+    for name, func, deps in stages:
+        key = module.hash_obj([key, name, _fingerprint(func), [_fingerprint(d) for d in deps]])
+        files.append(Path(path_checkpoint, f"{key}.pkl"))
+
+    # resume from the last stage that has checkpoint
+    start = 0
+    for i in reversed(range(len(stages))):
+        if files[i].exists():
+            df = _run_stage(df, stages[i][0], lambda _: pd.read_pickle(files[i]), profile)
+            files[i].touch()  # keep used checkpoint from prune_checkpoints
+            if profile is not None:
+                profile[-1]["source"] = "checkpoint"
+            start = i + 1
+            break
+
+    for (name, func, deps), file in zip(stages[start:], files[start:]):
+        df = _run_stage(df, name, func, profile)
+        module.write_atomic(file, df.to_pickle)
+    prune_checkpoints(path_checkpoint)
+    return df
+
+
+def _is_local(obj) -> bool:
+    """Return True if obj is a module of this repo, or a function or class defined in one."""
+    if inspect.ismodule(obj):
+        file = getattr(obj, "__file__", None)
+    else:
+        file = getattr(inspect.getmodule(obj), "__file__", None)
+    return file is not None and Path(file).resolve().parent == Path(__file__).resolve().parent
+
+
+def _get_references(func) -> dict:
+    """
+        Return objects of this repo that func refers to by global name,
+        including attributes of repo modules (e.g. module.map_unique)
+        and names used in functions defined inside func (e.g. lambda).
+    """
+    names = set()
+    codes = [func.__code__]
+    while codes:
+        code = codes.pop()
+        names.update(code.co_names)
+        codes += [const for const in code.co_consts if inspect.iscode(const)]
+
+    references = {}
+    for name in sorted(names):
+        if name not in func.__globals__:  # e.g. attribute or builtin
+            continue
+        obj = func.__globals__[name]
+        if inspect.ismodule(obj) and _is_local(obj):
+            references.update(
+                {f"{name}.{attr}": getattr(obj, attr) for attr in sorted(names) if hasattr(obj, attr)}
+            )
+        else:
+            references[name] = obj
+    # skip other libraries, e.g. pd or np.select
+    return {
+        name: obj
+        for name, obj in references.items()
+        if not inspect.ismodule(obj)
+        and (not (inspect.isroutine(obj) or inspect.isclass(obj)) or _is_local(obj))
+    }
+
+
+def _fingerprint(obj, seen: set = None) -> str:
+    """
+        Return hash of stage function or dependency.
+        Function = its source code, default arguments and everything of this repo
+        it refers to, recursively (helpers, mapping tables, rules, center_map).
+        So editing a helper a stage calls also invalidates the checkpoint of the stage.
+        Other objects = their content.
+    """
+    seen = set() if seen is None else seen
+    if isinstance(obj, partial):
+        return module.hash_obj(
+            [
+                _fingerprint(obj.func, seen),
+                [_fingerprint(arg, seen) for arg in obj.args],
+                {k: _fingerprint(v, seen) for k, v in obj.keywords.items()},
+            ]
+        )
+    if inspect.isfunction(obj) or inspect.isclass(obj):
+        # note: a function reached twice (or recursion) is hashed at its first occurrence
+        if id(obj) in seen:
+            return obj.__qualname__
+        seen.add(id(obj))
+    if inspect.isfunction(obj):
+        return module.hash_obj(
+            [
+                inspect.getsource(obj),
+                [_fingerprint(d, seen) for d in obj.__defaults__ or ()],
+                {k: _fingerprint(v, seen) for k, v in (obj.__kwdefaults__ or {}).items()},
+                {k: _fingerprint(v, seen) for k, v in _get_references(obj).items()},
+            ]
+        )
+    if inspect.isclass(obj):
+        methods = {k: v for k, v in vars(obj).items() if inspect.isfunction(v)}
+        return module.hash_obj(
+            [inspect.getsource(obj), {k: _fingerprint(v, seen) for k, v in methods.items()}]
+        )
+    if isinstance(obj, dict) and any(callable(v) for v in obj.values()):
+        return module.hash_obj({k: _fingerprint(v, seen) for k, v in obj.items()})
+    if isinstance(obj, pd.DataFrame):
+        return module.hash_df(obj)
+    if _is_local(type(obj)):  # e.g. module.center_map
+        return module.hash_obj([_fingerprint(type(obj), seen), vars(obj)])
+    return module.hash_obj(obj)
+
+
+def prune_checkpoints(
+    path_checkpoint: Path = config.path_checkpoint,
+    max_age_days: float = config.checkpoint_max_age_days,
+) -> int:
+    """
+        Delete checkpoints not written or read in the last max_age_days.
+        run_stages calls it after each run, checkpoints of changed code are never read again.
+
+    Args:
+        path_checkpoint (Path, optional): Defaults to config.path_checkpoint.
+        max_age_days (float, optional): Defaults to config.checkpoint_max_age_days.
+
+    Returns:
+        int: Number of deleted checkpoints.
+    """
+    min_mtime = time.time() - max_age_days * 24 * 3600
+    n_deleted = 0
+    for file in Path(path_checkpoint).glob("*.pkl"):
+        try:
+            if file.stat().st_mtime < min_mtime:
+                file.unlink()
+                n_deleted += 1
+        except FileNotFoundError:  # deleted by a parallel run
+            pass
+    return n_deleted
+
+
+# stages of df_clean
+# each stage takes df and returns df, and is checkpointed by run_stages
+
+
+def _drop_null(df: pd.DataFrame) -> pd.DataFrame:
+    # drop null rows and cols
+    return df.dropna(how="all", axis="columns").dropna(how="all", axis="rows")
+
+
+def _rename(df: pd.DataFrame) -> pd.DataFrame:
+    # clean col name
+    return (
+        df
+        .rename(columns=module.map_col)
+        .rename(columns=lambda c: c.lower().replace(" ", "_"))
+    )
+
+
+def _filter_month(df: pd.DataFrame, month: int, is_utc: bool) -> pd.DataFrame:
+    # obtain current month only
+    return (
+        df
+        .assign(class_date=lambda df_: module.convert_to_gmt_plus_7(df_, "class_date", is_utc))
+        .loc[lambda df_: df_["class_date"].dt.month == month]
+    )
+
+
+def _drop_duplicates(df: pd.DataFrame) -> pd.DataFrame:
+    # drop duplicated student attendance because i exported the att data multiple times
+    # assuming that one student can only exist once at a time
+    return df.drop_duplicates(subset=["student_code", "student_name", "class_time", "class_date"])
+
+
+def _clean_student(df: pd.DataFrame) -> pd.DataFrame:
+    return df.assign(
+        student_name=lambda df_: module.map_unique(df_["student_name"], lambda names: names.str.upper()),
+        # membership = dlx, online or GO
+        student_membership=lambda df_: module.create_student_membership(df_),
+        # new code = name + code
+        student_code=lambda df_: module.create_student_code(df_),
+        # clean student center raw to be used to determine class mode
+        student_center=lambda df_: (
+            module.map_unique(
+                df_["student_center"],
+                lambda centers: centers.str.replace("IN: ", "", regex=False).str.strip(),
+            )
+            .astype("category")
+        ),
+        # whether the student attend or not
+        student_attendance=lambda df_: module.create_attend(df_),
+    )
+
+
+def _clean_class(df: pd.DataFrame) -> pd.DataFrame:
+    return df.assign(
+        # clean class type for the first time
+        class_type=lambda df_: (
+            module.map_unique(
+                df_["class_type"],
+                lambda class_types: class_types.str.replace("Class", "", regex=False).str.title().str.strip(),
+            )
+            .astype("category")
+        ),
+        # create class time if not exist
+        class_time=lambda df_: module.create_class_time(df_),
+        # clean class description
+        class_description=lambda df_: module.map_unique(
+            df_["class_description"],
+            lambda descriptions: descriptions.str.lower().str.strip().astype("str"),
+        ),
+        # create class duration if not exist
+        class_duration=lambda df_: module.create_duration(df_).astype("float"),
+    )
+
+
+def _clean_teacher(df: pd.DataFrame) -> pd.DataFrame:
+    # clean teacher name for some teachers that are duplicated in coco
+    return df.assign(teacher=lambda df_: module.clean_teacher_name(df_).astype("str"))
+
+
+def _create_class_location(df: pd.DataFrame) -> pd.DataFrame:
+    # create class location from class description
+    return df.assign(class_location=lambda df_: module.create_class_location_1(df_))
+
+
+def _clean_shared_account_et(df: pd.DataFrame) -> pd.DataFrame:
+    # note: may 2023 - replace class with shared account with its real ET
+    # this is because of shared account problem
+    # should be before merging with df_teacher
+    return df.assign(teacher=lambda df_: module.clean_shared_account_et(df_))
+
+
+def _merge_teacher(df: pd.DataFrame, df_teacher: pd.DataFrame) -> pd.DataFrame:
+    # join on teacher index, keep coco_teacher_name as column
+    return df.join(
+        df_teacher.set_index("coco_teacher_name", drop=False).rename_axis(None),
+        on="teacher",
+        how="left",
+        validate="many_to_one",
+    ).reset_index(drop=True)
+
+
+def _create_class_mode(df: pd.DataFrame) -> pd.DataFrame:
+    # create class mode = offline, online or GOC
+    # this is done after teacher merging to get international teacher -> GOC
+    return df.assign(class_mode=lambda df_: module.create_class_mode(df_))
+
+
+def _fill_class_location(df: pd.DataFrame) -> pd.DataFrame:
+    # class location 2nd time to get class_location from teacher center
+    return df.assign(class_location=lambda df_: module.create_class_location_2(df_))
+
+
+def _create_class_area(df: pd.DataFrame) -> pd.DataFrame:
+    # assert that online class location is online
+    # assign area to each class
+    return df.assign(
+        class_location=lambda df_: module.assert_class_location_online(df_),
+        class_area=lambda df_: module.create_class_location_area(df_),
+    )
+
+
+def _compact(df: pd.DataFrame) -> pd.DataFrame:
+    # smaller dtypes, see module.compact_dtype_map
+    # note: memory before and after is in mb_in and mb_out of the profile
+    return module.compact_dtypes(df)
+
+
+def _finalize_df_clean(df: pd.DataFrame) -> pd.DataFrame:
+    # drop unnecessary columns and sort
+    return (
+        df
+        .drop(columns=["student_result", "class_unit"], errors="ignore")
+        .sort_values(["class_date", "class_time", "student_code"])
+        .sort_index(axis=1)  # sort columns alphabetically
+        .reset_index(drop=True)
+        .assign(index=lambda df_: df_.index + 1)  # create index column
+    )
+
+
+def get_clean_stages(month: int, df_teacher: pd.DataFrame, is_utc: bool = False) -> list:
+    """Return stages of df_clean as (name, function, dependencies)."""
+    center_area_map = module.center_map.get_center_area_map()
+    return [
+        # note: delete unknown share acc
+        ("delete_unknown_shared_acc", module.delete_unknown_shared_acc_teacher, []),
+        ("drop_null", _drop_null, []),
+        ("rename", _rename, [module.map_col]),
+        (
+            "filter_month",
+            partial(_filter_month, month=month, is_utc=is_utc),
+            [module.convert_to_gmt_plus_7],
+        ),
+        ("drop_duplicates", _drop_duplicates, []),
+        (
+            "clean_student",
+            _clean_student,
+            [
+                module.create_student_membership,
+                module.student_membership_rules,
+                module.predicates,
+                module.create_student_code,
+                module.create_attend,
+            ],
+        ),
+        ("clean_class", _clean_class, [module.create_class_time, module.create_duration]),
+        ("clean_teacher", _clean_teacher, [module.clean_teacher_name, module.teacher_name_map]),
+        (
+            "create_class_location",
+            _create_class_location,
+            [
+                module.create_class_location_1,
+                module.extract_class_location,
+                module.location_noise,
+                module.location_noise_pattern,
+                module.center_alias_pattern,
+                module.center_map.get_center_alias(),
+            ],
+        ),
+        (
+            "clean_shared_account_et",
+            _clean_shared_account_et,
+            [module.clean_shared_account_et, module.shared_acc_et_map],
+        ),
+        ("merge_teacher", partial(_merge_teacher, df_teacher=df_teacher), []),
+        (
+            "create_class_mode",
+            _create_class_mode,
+            [module.create_class_mode, module.class_mode_rules, module.predicates],
+        ),
+        (
+            "fill_class_location",
+            _fill_class_location,
+            [module.create_class_location_2, center_area_map],
+        ),
+        (
+            "create_class_area",
+            _create_class_area,
+            [
+                module.assert_class_location_online,
+                module.create_class_location_area,
+                module.class_location_areas,
+                center_area_map,
+            ],
+        ),
+        ("finalize", _finalize_df_clean, []),
+        ("compact", _compact, [module.compact_dtype_map]),
+    ]
+
+
+def create_df_clean(
+    df: pd.DataFrame,
+    month: int,
+    df_teacher_sheet_name: str,
+    is_utc: bool = False,
+    path_checkpoint: Path = config.path_checkpoint,
+    profile: list = None,
+    engine: str = config.engine,
+) -> pd.DataFrame:
+    """
+        Create df attendance, row = single student attendance.
+
+    Args:
+        df (pd.DataFrame): Raw df, after module.clean_student_name.
+        month (int): Month to keep.
+        df_teacher_sheet_name (str): Sheet name in trainer data.
+        is_utc (bool, optional): True if date is in UTC. Defaults to False.
+        path_checkpoint (Path, optional): See run_stages.
+        profile (list, optional): See run_stages.
+        engine (str, optional): pandas or polars, see backend.get_stages.
+
+    Returns:
+        pd.DataFrame: df_clean
+    """
+    df_teacher = module.load_df_teacher(df_teacher_sheet_name)
+    stages = backend.get_stages(get_clean_stages(month, df_teacher, is_utc), engine)
+    return run_stages(df, stages, path_checkpoint, profile)
+
+
+# stages of df_session
+
+
+def _create_class_type_service(df: pd.DataFrame) -> pd.DataFrame:
+    # class type grouped and class service share predicates, e.g. online and only vip
+    context = module.RuleContext(df)
+    return df.assign(
+        class_type_grouped=module.create_class_type_grouped(df, context),
+        class_service=module.create_class_service(df, context),
+    )
+
+
+def _create_class_status(df: pd.DataFrame) -> pd.DataFrame:
+    # delivered or not delivered
+    return df.assign(class_status=lambda df_: module.create_class_status(df_))
+
+
+def _create_class_grouping(df: pd.DataFrame) -> pd.DataFrame:
+    # class grouping, which groups each class into its membership type
+    return df.assign(class_grouping=lambda df_: df_["class_type_grouped"].map(module.class_grouping))
+
+
+def _finalize_df_session(df: pd.DataFrame, df_teacher_sheet_name: str) -> pd.DataFrame:
+    # drop unused cols and arrange
+    df_session = (
+        df
+        .drop(columns=["class_member_vip", "class_member_deluxe", "class_member_go"])
+        .sort_index(axis=1)
+        .reset_index(drop=True)
+        .assign(index=lambda df_: df_.index + 1)
+    )
+
+    # in 2023-09 there is wrong encounter
+    if df_teacher_sheet_name == "2023-09":
+        teachers = ["Handayani Khaerunisyah Risma"]
+        df_session = df_session.loc[
+            ~((df_session["teacher"].isin(teachers)) & (df_session["class_type_grouped"] == "Encounter"))
+        ]
+    return df_session
+
+
+def get_session_stages(df_teacher_sheet_name: str) -> list:
+    """Return stages of df_session as (name, function, dependencies)."""
+    return [
+        ("create_session", module.create_session, [module.session_key]),
+        (
+            "create_class_type_service",
+            _create_class_type_service,
+            [
+                module.create_class_type_grouped,
+                module.class_type_grouped_rules,
+                module.create_class_service,
+                module.class_service_rules,
+                module.predicates,
+            ],
+        ),
+        ("create_class_status", _create_class_status, [module.create_class_status]),
+        ("create_class_grouping", _create_class_grouping, [module.class_grouping]),
+        (
+            "finalize",
+            partial(_finalize_df_session, df_teacher_sheet_name=df_teacher_sheet_name),
+            [],
+        ),
+        ("compact", _compact, [module.compact_dtype_map]),
+    ]
+
+
+def create_df_session(
+    df_clean: pd.DataFrame,
+    df_teacher_sheet_name: str,
+    path_checkpoint: Path = config.path_checkpoint,
+    profile: list = None,
+) -> pd.DataFrame:
+    """
+        Create df session, row = single session.
+
+    Args:
+        df_clean (pd.DataFrame)
+        df_teacher_sheet_name (str): Sheet name in trainer data.
+        path_checkpoint (Path, optional): See run_stages.
+        profile (list, optional): See run_stages.
+
+    Returns:
+        pd.DataFrame: df_session
+    """
+    stages = get_session_stages(df_teacher_sheet_name)
+    return run_stages(df_clean, stages, path_checkpoint, profile)
+
+
+cube_dimensions = [
+    "class_area",
+    "class_location",
+    "class_grouping",
+    "class_type_grouped",
+    "class_service",
+    "class_status",
+    "class_mode",
+    "teacher_position",
+    "class_date",
+    "class_hour",
+]
+
+
+def create_df_cube(df_session: pd.DataFrame) -> pd.DataFrame:
+    """
+        Create df cube, row = count of sessions per cube_dimensions, for dashboards.
+        Counts can be summed to any coarser grain, rates must be recomputed from counts.
+        class_date and class_hour are kept so that daily and hourly views also
+        read the cube instead of df_session.
+
+    Args:
+        df_session (pd.DataFrame)
+
+    Returns:
+        pd.DataFrame: df_cube
+    """
+    df_cube = (
+        df_session
+        .assign(
+            class_date=lambda df_: df_["class_date"].dt.normalize(),
+            class_hour=lambda df_: module.map_unique(
+                df_["class_time"], lambda times: times.astype(str).str[:2].astype(int)
+            ),
+            is_given=lambda df_: df_["class_status"] == "Given",
+        )
+        .groupby(cube_dimensions, observed=True, dropna=False)
+        .agg(
+            sessions=("is_given", "size"),
+            sessions_given=("is_given", "sum"),
+            bookings=("class_booking", "sum"),
+            attendance=("class_attendance", "sum"),
+            hours=("class_duration", "sum"),
+        )
+        .reset_index()
+    )
+    df_cube["sessions_not_given"] = df_cube["sessions"] - df_cube["sessions_given"]
+    df_cube["given_rate"] = df_cube["sessions_given"] / df_cube["sessions"]
+    df_cube["attendance_rate"] = df_cube["attendance"] / df_cube["bookings"].where(
+        df_cube["bookings"] > 0
+    )
+    return df_cube
+
+
+def test_df(
+    df: pd.DataFrame,
+    df_clean: pd.DataFrame,
+    df_session: pd.DataFrame,
+    df_teacher_sheet_name: str,
+    path_report: Path = None,
+) -> pd.DataFrame:
+    """
+        Run tests to attendance and session data.
+        Every check is run, then AssertionError lists all failed checks.
+
+    Args:
+        df (pd.DataFrame): Raw df.
+        df_clean (pd.DataFrame)
+        df_session (pd.DataFrame)
+        df_teacher_sheet_name (str): Sheet name in trainer data.
+        path_report (Path, optional): Save report as json. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Report, see validation.validate.
+    """
+    report = validation.validate(df, df_clean, df_session, df_teacher_sheet_name)
+    if path_report is not None:
+        Path(path_report).parent.mkdir(parents=True, exist_ok=True)
+        validation.save_report(report, path_report)
+    validation.assert_valid(report)
+    return report
+
+
+def write_parquet(df: pd.DataFrame, path: Path) -> None:
+    """
+        Write df as parquet. Repeated str columns (e.g. teacher, class_type) are
+        converted to categorical first, so they are dictionary encoded
+        and read back as categorical.
+    """
+    categories = {
+        col: "category"
+        for col in df.select_dtypes("object").columns
+        if pd.api.types.infer_dtype(df[col], skipna=True) == "string"
+        and df[col].nunique() <= len(df) / 2
+    }
+    df.astype(categories).to_parquet(path, index=False)
+
+
+def write_xlsx(df: pd.DataFrame, path: Path, chunk_rows: int = 1000) -> None:
+    """
+        Write df as xlsx with xlsxwriter constant memory mode, row by row.
+        Values are converted chunk_rows rows at a time, so neither the workbook
+        nor the converted values hold the whole df. Output is the same as df.to_excel(index=False).
+    """
+    workbook = xlsxwriter.Workbook(
+        path, {"constant_memory": True, "default_date_format": "yyyy-mm-dd hh:mm:ss"}
+    )
+    worksheet = workbook.add_worksheet("Sheet1")
+    header_format = workbook.add_format(
+        {"bold": True, "border": 1, "align": "center", "valign": "top"}
+    )
+    worksheet.write_row(0, 0, df.columns.astype(str), header_format)
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start : start + chunk_rows]
+        # NaN is written as blank cell, like to_excel
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for i, row in enumerate(values.itertuples(index=False, name=None), start=start + 1):
+            worksheet.write_row(i, 0, row)
+    workbook.close()
+
+
+output_writers = {"parquet": write_parquet, "xlsx": write_xlsx}
+
+
+def save_df(
+    df_clean: pd.DataFrame,
+    df_session: pd.DataFrame,
+    year: int,
+    month: int,
+    overwrite: bool = False,
+    output_formats: list = config.output_formats,
+) -> bool:
+    """
+        Save df_session and df_clean to output/{year}/{year}-{month}.
+        All files are written concurrently. Then the month and its cube
+        are written to the store, replacing the month if already stored.
+
+    Args:
+        df_clean (pd.DataFrame)
+        df_session (pd.DataFrame)
+        year (int)
+        month (int)
+        overwrite (bool, optional): Overwrite existing files. Defaults to False.
+        output_formats (list, optional): parquet and/or xlsx. Defaults to config.output_formats.
+
+    Returns:
+        bool: True if files are saved.
+    """
+    output_folder = get_output_folder(year, month)
+    files = []
+    for output_format in output_formats:
+        session_filepath, att_filepath = get_output_files(year, month, output_format)
+        files += [(df_session, session_filepath, output_format), (df_clean, att_filepath, output_format)]
+
+    if not overwrite and any(filepath.exists() for _, filepath, _ in files):
+        print(f"Files already exist in {output_folder}")
+        return False
+
+    output_folder.mkdir(parents=True, exist_ok=True)
+    # note: parquet releases the GIL, so it runs while xlsx is being written
+    with ThreadPoolExecutor(max_workers=len(files)) as executor:
+        futures = [
+            executor.submit(output_writers[output_format], df, filepath)
+            for df, filepath, output_format in files
+        ]
+        for future in futures:
+            future.result()
+    print(f"Files saved to {', '.join(str(filepath) for _, filepath, _ in files)}")
+    store.write_month(df_clean, df_session, create_df_cube(df_session), year, month)
+    return True
+
+
+def run(
+    year: int,
+    month: int,
+    path_raw_data: Path = None,
+    is_utc: bool = False,
+    is_mutiple_files: bool = True,
+    n_jobs: int = config.n_jobs,
+    overwrite: bool = False,
+    incremental: bool = False,
+    profile: bool = config.profile,
+    output_formats: list = config.output_formats,
+    engine: str = config.engine,
+) -> tuple:
+    """
+        Run the whole pipeline for one month.
+        All parameters are passed explicitly, config.py is not used
+        except for n_jobs, path_cache, path_store and path_trainer_data.
+        If incremental, the month is skipped when its manifest in output folder
+        is unchanged, else it is rebuilt and overwritten.
+
+    Args:
+        year (int)
+        month (int)
+        path_raw_data (Path, optional): Defaults to input/{year}/{year}-{month}.
+        is_utc (bool, optional): True if date is in UTC (data from ken).
+        is_mutiple_files (bool, optional): False if data is in one file (data from ken).
+        n_jobs (int, optional): Processes used to parse input files.
+        overwrite (bool, optional): Overwrite existing output files.
+        incremental (bool, optional): Only rebuild if input or mapping changed.
+        profile (bool, optional): Save time, rows and memory of each stage
+            to profile.json in output folder, see load_profiles.
+        output_formats (list, optional): parquet and/or xlsx.
+        engine (str, optional): pandas or polars, engine of df_clean stages.
+
+    Returns:
+        tuple: df_clean, df_session. None if month is skipped.
+    """
+    if path_raw_data is None:
+        path_raw_data = get_path_raw_data(year, month)
+    df_teacher_sheet_name = f"{year}-{month:02d}"
+
+    manifest = get_manifest(path_raw_data, is_mutiple_files, df_teacher_sheet_name)
+    manifest_file = Path(get_output_folder(year, month), "manifest.json")
+    if incremental:
+        is_output_exist = all(
+            file.exists()
+            for output_format in output_formats
+            for file in get_output_files(year, month, output_format)
+        )
+        if (
+            is_output_exist
+            and manifest_file.exists()
+            and json.loads(manifest_file.read_text()) == manifest
+        ):
+            print(f"{df_teacher_sheet_name}: up to date, skipped")
+            return None
+        overwrite = True
+
+    df = module.load_raw_data(
+        path_raw_data, is_mutiple_files, month=month, is_utc=is_utc, n_jobs=n_jobs
+    )
+    df = module.clean_student_name(df)
+    profile_clean, profile_session = ([], []) if profile else (None, None)
+    df_clean = create_df_clean(
+        df, month, df_teacher_sheet_name, is_utc, profile=profile_clean, engine=engine
+    )
+    df_session = create_df_session(df_clean, df_teacher_sheet_name, profile=profile_session)
+    if profile:
+        save_profile(profile_clean, profile_session, year, month)
+    path_report = Path(get_output_folder(year, month), "validation.json")
+    test_df(df, df_clean, df_session, df_teacher_sheet_name, path_report)
+
+    print(f"{df_teacher_sheet_name}: session = {len(df_session)}, attendance = {len(df_clean)}")
+    if save_df(df_clean, df_session, year, month, overwrite, output_formats):
+        manifest_file.write_text(json.dumps(manifest, indent=4))
+    return df_clean, df_session
+
+
+def save_profile(profile_clean: list, profile_session: list, year: int, month: int) -> None:
+    """Save profile of df_clean and df_session stages to profile.json in output folder."""
+    output_folder = get_output_folder(year, month)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    summary = {
+        "month": f"{year}-{month:02d}",
+        "seconds": round(sum(r["seconds"] for r in profile_clean + profile_session), 4),
+        "clean": profile_clean,
+        "session": profile_session,
+    }
+    Path(output_folder, "profile.json").write_text(json.dumps(summary, indent=4))
+
+
+def load_profiles(start: str, end: str) -> pd.DataFrame:
+    """
+        Load profile.json of months from start to end to compare stages across months.
+
+    Args:
+        start (str): First month, e.g. 2023-01.
+        end (str): Last month, e.g. 2024-05.
+
+    Returns:
+        pd.DataFrame: One row per month and stage. Months without profile are skipped.
+    """
+    records = []
+    for year, month in get_months(start, end):
+        profile_file = Path(get_output_folder(year, month), "profile.json")
+        if not profile_file.exists():
+            continue
+        summary = json.loads(profile_file.read_text())
+        for chain in ["clean", "session"]:
+            records += [{"month": summary["month"], "df": chain, **r} for r in summary[chain]]
+    return pd.DataFrame(records)
+
+
+def get_months(start: str, end: str) -> list:
+    """Return list of (year, month) from start to end inclusive, e.g. 2023-01 to 2024-05."""
+    return [(p.year, p.month) for p in pd.period_range(start, end, freq="M")]
+
+
+def _run_month(year: int, month: int, kwargs: dict) -> str:
+    """Run one month in backfill, return error message instead of raising."""
+    try:
+        run(year, month, **kwargs)
+        return "ok"
+    except Exception:
+        return traceback.format_exc()
+
+
+def backfill(start: str, end: str, workers: int = None, **kwargs) -> dict:
+    """
+        Run months from start to end, each month in its own process.
+        Each month gets its year and month explicitly, so months do not share state.
+        Input files are parsed serially inside each month, the pool is over months.
+
+    Args:
+        start (str): First month, e.g. 2023-01.
+        end (str): Last month, e.g. 2024-05.
+        workers (int, optional): Number of processes. None = all cores.
+        **kwargs: Passed to run.
+
+    Returns:
+        dict: {(year, month): "ok" or error traceback}
+    """
+    months = get_months(start, end)
+    kwargs = {**kwargs, "n_jobs": 1}
+    # parse trainer workbook once, months then read its cache
+    module.load_trainer_roster(module.path_trainer_data, module.path_cache)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            (year, month): executor.submit(_run_month, year, month, kwargs)
+            for year, month in months
+        }
+        results = {key: future.result() for key, future in futures.items()}
+
+    for (year, month), result in results.items():
+        if result != "ok":
+            print(f"{year}-{month:02d} failed:\n{result}")
+    n_failed = sum(result != "ok" for result in results.values())
+    print(f"backfill done: {len(results) - n_failed} ok, {n_failed} failed")
+    return results
+
+
+def main(args: list = None) -> None:
+    parser = argparse.ArgumentParser(description="Process Coco class session and attendance.")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--month", type=int)
+    parser.add_argument("--start", help="first month to backfill, e.g. 2023-01")
+    parser.add_argument("--end", help="last month to backfill, e.g. 2024-05")
+    parser.add_argument("--workers", type=int, help="processes for backfill, one month each")
+    parser.add_argument(
+        "--path-raw-data", type=Path, help="file or folder, defaults to input/{year}/{year}-{month}"
+    )
+    parser.add_argument("--utc", action="store_true", help="date is in utc (data from ken)")
+    parser.add_argument("--single-file", action="store_true", help="data in one file (data from ken)")
+    parser.add_argument("--n-jobs", type=int, default=config.n_jobs, help="processes to parse input files")
+    parser.add_argument("--overwrite", action="store_true", help="overwrite existing output files")
+    parser.add_argument(
+        "--incremental", action="store_true", help="only rebuild months whose input or mapping changed"
+    )
+    parser.add_argument(
+        "--profile", action="store_true", default=config.profile, help="save time and memory of each stage"
+    )
+    parser.add_argument("--no-xlsx", action="store_true", help="only save parquet output")
+    parser.add_argument(
+        "--engine", choices=backend.engines, default=config.engine, help="engine of df_clean stages"
+    )
+    args = parser.parse_args(args)
+    output_formats = ["parquet"] if args.no_xlsx else config.output_formats
+
+    if args.start and args.end:
+        results = backfill(
+            args.start,
+            args.end,
+            workers=args.workers,
+            is_utc=args.utc,
+            overwrite=args.overwrite,
+            incremental=args.incremental,
+            profile=args.profile,
+            output_formats=output_formats,
+            engine=args.engine,
+        )
+        if any(result != "ok" for result in results.values()):
+            raise SystemExit(1)
+    elif args.year and args.month:
+        run(
+            args.year,
+            args.month,
+            path_raw_data=args.path_raw_data,
+            is_utc=args.utc,
+            is_mutiple_files=not args.single_file,
+            n_jobs=args.n_jobs,
+            overwrite=args.overwrite,
+            incremental=args.incremental,
+            profile=args.profile,
+            output_formats=output_formats,
+            engine=args.engine,
+        )
+    else:
+        parser.error("specify --year and --month, or --start and --end")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+SQL over the store (see store.py) for the experience management report, with DuckDB in process.
+Tables session, attendance and cube are views over the parquet partitions, so a query
+only scans the months (year and month folders) and columns it uses.
+
+Usage:
+    report.query("area_grouping_status", "2023-06", "2024-05")
+    report.query("select class_type, count(*) from session group by 1")
+    python -m report teacher_booking --start 2024-01 --end 2024-05 --output teacher.csv
+"""
+
+import argparse
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+import config
+import store
+
+# prepared queries of the standard cuts, months are filtered with in_months (see connect)
+queries = {
+    "area_grouping_status": """
+        select
+            year,
+            month,
+            class_area,
+            class_grouping,
+            class_status,
+            count(*) as sessions,
+            sum(class_booking) as bookings,
+            sum(class_attendance) as attendance,
+            sum(class_duration) as hours
+        from session
+        where in_months(year, month, $start_year, $start_month, $end_year, $end_month)
+        group by all
+        order by all
+    """,
+    "teacher_booking": """
+        select
+            year,
+            month,
+            teacher,
+            teacher_center,
+            teacher_position,
+            count(*) as sessions,
+            count(*) filter (class_status = 'Given') as sessions_given,
+            sum(class_booking) as bookings,
+            sum(class_attendance) as attendance,
+            sum(class_attendance) / nullif(sum(class_booking), 0) as attendance_rate
+        from session
+        where in_months(year, month, $start_year, $start_month, $end_year, $end_month)
+        group by all
+        order by all
+    """,
+    "center_utilisation": """
+        select
+            year,
+            month,
+            class_area,
+            class_location,
+            count(*) as sessions,
+            count(*) filter (class_status = 'Given') as sessions_given,
+            sum(class_booking) as bookings,
+            sum(class_attendance) as attendance,
+            sum(class_duration) filter (class_status = 'Given') as hours_given,
+            sum(class_booking) / count(*) as bookings_per_session,
+            sum(class_attendance) / nullif(sum(class_booking), 0) as attendance_rate,
+            count(*) filter (class_status = 'Given') / count(*) as given_rate
+        from session
+        where in_months(year, month, $start_year, $start_month, $end_year, $end_month)
+        group by all
+        order by all
+    """,
+}
+
+
+def connect(root: Path = config.path_store) -> duckdb.DuckDBPyConnection:
+    """
+        Open in-memory DuckDB with a view for each dataset in the store.
+        year and month columns come from the partition folders.
+        Macro in_months compares year and month separately, DuckDB only skips
+        partitions for plain comparisons (not e.g. year * 100 + month).
+
+    Args:
+        root (Path, optional): Folder of the store. Defaults to config.path_store.
+
+    Returns:
+        duckdb.DuckDBPyConnection
+    """
+    con = duckdb.connect()
+    stored = [
+        dataset
+        for dataset in store.datasets
+        if any(Path(root, dataset).glob("year=*/month=*/data.parquet"))
+    ]
+    if not stored:
+        raise FileNotFoundError(f"No month in {root}, run pipeline or python -m store first")
+    for dataset in stored:
+        files = Path(root, dataset, "year=*", "month=*", "data.parquet").as_posix()
+        con.execute(
+            f"""
+            create view {dataset} as
+            select * from read_parquet(
+                '{files}',
+                hive_partitioning = true,
+                hive_types = {{'year': integer, 'month': integer}},
+                union_by_name = true
+            )
+            """
+        )
+    con.execute(
+        """
+        create macro in_months(year, month, start_year, start_month, end_year, end_month) as
+            (year > start_year or (year = start_year and month >= start_month))
+            and (year < end_year or (year = end_year and month <= end_month))
+        """
+    )
+    return con
+
+
+def _month_params(start: str, end: str) -> dict:
+    """Return parameters of in_months from start and end, e.g. 2024-05. None = no limit."""
+    start = pd.Period(start, freq="M") if start else pd.Period("1900-01", freq="M")
+    end = pd.Period(end, freq="M") if end else pd.Period("9999-12", freq="M")
+    return {
+        "start_year": start.year,
+        "start_month": start.month,
+        "end_year": end.year,
+        "end_month": end.month,
+    }
+
+
+def query(
+    sql: str,
+    start: str = None,
+    end: str = None,
+    con: duckdb.DuckDBPyConnection = None,
+    root: Path = config.path_store,
+) -> pd.DataFrame:
+    """
+        Run a prepared query or any sql over the store.
+
+    Args:
+        sql (str): Name of query in queries, or sql over tables session, attendance and cube.
+        start (str, optional): First month, e.g. 2023-06. None = from the first.
+        end (str, optional): Last month, e.g. 2024-05. None = until the last.
+        con (duckdb.DuckDBPyConnection, optional): Reuse connection of connect. Defaults to None.
+        root (Path, optional): Folder of the store, if con is None. Defaults to config.path_store.
+
+    Returns:
+        pd.DataFrame: Result of the query.
+    """
+    con = con or connect(root)
+    if sql in queries:
+        return con.execute(queries[sql], _month_params(start, end)).df()
+    return con.execute(sql).df()
+
+
+def main(args: list = None) -> None:
+    parser = argparse.ArgumentParser(description="Query processed months in the store.")
+    parser.add_argument("sql", help=f"one of {list(queries)} or sql")
+    parser.add_argument("--start", help="first month, e.g. 2023-06")
+    parser.add_argument("--end", help="last month, e.g. 2024-05")
+    parser.add_argument("--root", type=Path, default=config.path_store, help="folder of the store")
+    parser.add_argument("--output", type=Path, help="save result as csv")
+    args = parser.parse_args(args)
+
+    df = query(args.sql, args.start, args.end, root=args.root)
+    if args.output is not None:
+        df.to_csv(args.output, index=False)
+    with pd.option_context("display.max_rows", 100, "display.width", 200):
+        print(df)
+
+
+if __name__ == "__main__":
+    main()
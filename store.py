@@ -0,0 +1,200 @@
+"""
+History of processed months as one parquet dataset per output
+(and the cube of pipeline.create_df_cube), partitioned by month:
+    store/{dataset}/year={year}/month={month}/data.parquet
+Writing a month overwrites its partition only. Reading prunes partitions by path
+before opening any file and reads only the requested columns, so a year of
+sessions is read without touching the monthly excel files.
+
+Usage:
+    store.read("session", "2023-06", "2024-05", columns=["class_date", "class_type"])
+    python -m store --start 2023-01 --end 2024-05  # import existing output files
+"""
+
+import argparse
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import config
+import module
+
+datasets = ["session", "attendance", "cube"]
+
+
+def get_partition(dataset: str, year: int, month: int, root: Path = config.path_store) -> Path:
+    """Return folder of one month of dataset."""
+    if dataset not in datasets:
+        raise ValueError(f"Unknown dataset {dataset}, expected one of {datasets}")
+    return Path(root, dataset, f"year={year}", f"month={month:02d}")
+
+
+def categorize(df: pd.DataFrame) -> pd.DataFrame:
+    """
+        Convert every str column to categorical, so they are dictionary encoded.
+        Unlike pipeline.write_parquet this does not depend on the values,
+        so every partition has the same schema.
+    """
+    categories = {
+        col: "category"
+        for col in df.select_dtypes("object").columns
+        if pd.api.types.infer_dtype(df[col], skipna=True) == "string"
+    }
+    return df.astype(categories)
+
+
+def write_partition(
+    df: pd.DataFrame, dataset: str, year: int, month: int, root: Path = config.path_store
+) -> Path:
+    """
+        Write one month of dataset, replacing the month if already stored.
+
+    Args:
+        df (pd.DataFrame): df_session, df_clean or df_cube of the month.
+        dataset (str): session, attendance or cube.
+        year (int)
+        month (int)
+        root (Path, optional): Defaults to config.path_store.
+
+    Returns:
+        Path: Written parquet file.
+    """
+    parquet_file = Path(get_partition(dataset, year, month, root), "data.parquet")
+    # readers never see partial month
+    module.write_atomic(
+        parquet_file, lambda tmp_file: categorize(df).to_parquet(tmp_file, index=False)
+    )
+    return parquet_file
+
+
+def write_month(
+    df_clean: pd.DataFrame,
+    df_session: pd.DataFrame,
+    df_cube: pd.DataFrame,
+    year: int,
+    month: int,
+    root: Path = config.path_store,
+) -> None:
+    """Write attendance, session and cube of one month."""
+    write_partition(df_session, "session", year, month, root)
+    write_partition(df_clean, "attendance", year, month, root)
+    write_partition(df_cube, "cube", year, month, root)
+
+
+def list_partitions(
+    dataset: str, start: str = None, end: str = None, root: Path = config.path_store
+) -> pd.DataFrame:
+    """
+        List stored months of dataset from start to end, from folder names only.
+
+    Args:
+        dataset (str): session, attendance or cube.
+        start (str, optional): First month, e.g. 2023-01. None = from the first.
+        end (str, optional): Last month, e.g. 2024-05. None = until the last.
+        root (Path, optional): Defaults to config.path_store.
+
+    Returns:
+        pd.DataFrame: year, month and path, sorted by month.
+    """
+    start = pd.Period(start, freq="M") if start else None
+    end = pd.Period(end, freq="M") if end else None
+    records = []
+    for parquet_file in Path(root, dataset).glob("year=*/month=*/data.parquet"):
+        year = int(parquet_file.parent.parent.name.removeprefix("year="))
+        month = int(parquet_file.parent.name.removeprefix("month="))
+        period = pd.Period(year=year, month=month, freq="M")
+        if (start is None or period >= start) and (end is None or period <= end):
+            records.append({"year": year, "month": month, "path": parquet_file})
+    return (
+        pd.DataFrame(records, columns=["year", "month", "path"])
+        .sort_values(["year", "month"], ignore_index=True)
+    )
+
+
+def read(
+    dataset: str,
+    start: str = None,
+    end: str = None,
+    columns: list = None,
+    root: Path = config.path_store,
+) -> pd.DataFrame:
+    """
+        Read months of dataset from start to end as one frame.
+
+    Args:
+        dataset (str): session, attendance or cube.
+        start (str, optional): First month, e.g. 2023-06. None = from the first.
+        end (str, optional): Last month, e.g. 2024-05. None = until the last.
+        columns (list, optional): Columns to read. None = all.
+        root (Path, optional): Defaults to config.path_store.
+
+    Returns:
+        pd.DataFrame: Rows of every month, in month order. str columns are categorical.
+    """
+    partitions = list_partitions(dataset, start, end, root)
+    if partitions.empty:
+        return pd.DataFrame(columns=columns)
+    tables = [_read_partition(path, columns) for path in partitions["path"]]
+    # note: a column added in later months is NaN in earlier ones.
+    # categories are unified across months, ordered ones (class_time) keep
+    # their order because every month has the same categories
+    table = pa.concat_tables(tables, promote_options="permissive")
+    return table.to_pandas()
+
+
+def _read_partition(path: Path, columns: list = None) -> pa.Table:
+    """Read columns of one partition, columns that the month does not have are null."""
+    if columns is None:
+        return pq.read_table(path)
+    names = pq.read_schema(path).names
+    table = pq.read_table(path, columns=[col for col in columns if col in names])
+    for col in columns:
+        if col not in names:
+            table = table.append_column(col, pa.nulls(len(table)))
+    return table.select(columns)
+
+
+def import_outputs(start: str, end: str, root: Path = config.path_store) -> list:
+    """
+        Store months already processed by pipeline, from their output files.
+        Parquet output is used if exists, else xlsx.
+
+    Args:
+        start (str): First month, e.g. 2023-01.
+        end (str): Last month, e.g. 2024-05.
+        root (Path, optional): Defaults to config.path_store.
+
+    Returns:
+        list: (year, month) that are stored. Months without output are skipped.
+    """
+    # imported here, pipeline writes to store after each run
+    import pipeline
+
+    stored = []
+    for year, month in pipeline.get_months(start, end):
+        for output_format, read_output in [("parquet", pd.read_parquet), ("xlsx", pd.read_excel)]:
+            session_filepath, att_filepath = pipeline.get_output_files(year, month, output_format)
+            if session_filepath.exists() and att_filepath.exists():
+                df_session = read_output(session_filepath)
+                df_cube = pipeline.create_df_cube(df_session)
+                write_month(read_output(att_filepath), df_session, df_cube, year, month, root)
+                stored.append((year, month))
+                break
+    return stored
+
+
+def main(args: list = None) -> None:
+    parser = argparse.ArgumentParser(description="Store output files of processed months.")
+    parser.add_argument("--start", required=True, help="first month, e.g. 2023-01")
+    parser.add_argument("--end", required=True, help="last month, e.g. 2024-05")
+    parser.add_argument("--root", type=Path, default=config.path_store, help="folder of the store")
+    args = parser.parse_args(args)
+
+    stored = import_outputs(args.start, args.end, args.root)
+    print(f"{len(stored)} months stored in {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+Generate synthetic Coco exports (MyCenterClass workbooks) and trainer data
+with the same layout as the real ones, to test and benchmark the pipeline
+without real data.
+
+Scale 1 is about a real month (2024-05): ~4,300 sessions, ~15,000 attendances,
+each exported ~14 times across 64 files. Scale 100 is 100 times that.
+
+Usage:
+    python -m synthetic --year 2024 --month 5 --scale 1 --folder synthetic
+    # then e.g. python -m pipeline --year 2024 --month 5 --path-raw-data synthetic/input/2024/2024-05
+"""
+
+import argparse
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import config
+import module
+
+center_map = config.CenterMap()  # initialize center map class
+
+# per 1x of a real month
+n_sessions_per_scale = 4300
+n_students_per_scale = 1850
+n_teachers_per_scale = 270
+
+# offline centers that have classes
+centers = ["PP", "SDC", "KG", "GC", "LW", "BSD", "TBS", "CP", "KK", "CBB", "SMB", "DG", "PKW"]
+# shared coco accounts, class ET is written at the end of the description
+shared_accounts = [f"{i} ONLINE TRAINER (JKT {i % 3 + 1})" for i in range(1, 21)]
+shared_account_ets = [k for k in module.shared_acc_et_map if re.fullmatch(r"[a-z .]+", k)]
+
+# class type: share of sessions, mean students per session, student pool
+class_types = {
+    "Social Club": (0.25, 6, "offline"),
+    "Online Social Club": (0.20, 6, "online"),
+    "Online Complementary Class": (0.12, 3, "online"),
+    "Complementary Class": (0.06, 3, "offline"),
+    "Online Encounter": (0.12, 3, "goc"),
+    "Online English Corner": (0.05, 2, "vip"),
+    "Encounter": (0.05, 1.5, "vip"),
+    "Online Advising Session": (0.08, 1, "standard"),
+    "Online Welcome": (0.04, 1, "standard"),
+    "First Lesson": (0.02, 1, "offline"),
+    "Advising Session": (0.01, 1, "offline"),
+}
+results = {
+    "Passed": 0.73,
+    "Failed": 0.23,
+    "Continue": 0.025,
+    "No Show": 0.008,
+    "Repeat": 0.002,
+    "Technology Student": 0.005,
+}
+class_hours = [f"{hour:02d}:00" for hour in range(7, 22)]
+
+# column layout of MyCenterClass export, blank columns are unnamed
+export_columns = [
+    "Student Name",
+    "Student Code",
+    "Service Type",
+    "",
+    "Type of Class\nAll Class",
+    "Center Name",
+    "Class Startdate",
+    "Class Start Time",
+    "Duration",
+    "Description",
+    "Unit",
+    "Teacher",
+    " ",
+    "Result",
+]
+
+_syllables = [
+    "an", "ar", "bu", "da", "di", "el", "fa", "gi", "ha", "in", "ja", "ka", "la", "ma",
+    "na", "ni", "pu", "ra", "ri", "sa", "si", "ta", "ti", "wa", "ya", "yu", "zu", "ko",
+]
+
+
+def make_names(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Return n distinct uppercase "LAST FIRST" names."""
+    syllables = np.array(_syllables)
+    lasts = np.char.add(
+        np.char.add(rng.choice(syllables, n), rng.choice(syllables, n)), rng.choice(syllables, n)
+    )
+    firsts = np.char.add(rng.choice(syllables, n), rng.choice(syllables, n))
+    # note: index makes names unique without changing their shape
+    suffixes = np.array([_to_letters(i) for i in range(n)])
+    return np.char.upper(np.char.add(np.char.add(lasts, suffixes), np.char.add(" ", firsts)))
+
+
+def _to_letters(i: int) -> str:
+    """Return i in base 26 letters, e.g. 0 -> a, 27 -> bb."""
+    letters = ""
+    while True:
+        letters = chr(ord("a") + i % 26) + letters
+        i = i // 26 - 1
+        if i < 0:
+            return letters
+
+
+def make_teachers(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    """
+        Make teachers with coco name, e.g. "BASUKI (PP) IMELDA",
+        and their trainer data, including the ETs behind shared accounts.
+
+    Args:
+        n (int): Number of teachers with own coco account.
+        rng (np.random.Generator)
+
+    Returns:
+        pd.DataFrame: Teachers, coco_name is NaN for ETs of shared accounts.
+    """
+    names = pd.Series(make_names(n, rng)).str.split(" ", n=1, expand=True)
+    teacher_centers = rng.choice(centers, n)
+    df_teacher = pd.DataFrame(
+        {
+            "coco_name": names[0] + " (" + teacher_centers + ") " + names[1],
+            "coco_teacher_name": (names[0] + " " + names[1]).str.title(),
+            "teacher_center": teacher_centers,
+        }
+    )
+    shared_ets = sorted(set(module.shared_acc_et_map[et] for et in shared_account_ets))
+    df_shared = pd.DataFrame(
+        {
+            "coco_name": np.nan,
+            "coco_teacher_name": shared_ets,
+            "teacher_center": rng.choice(centers, len(shared_ets)),
+        }
+    )
+    return (
+        pd.concat([df_teacher, df_shared], ignore_index=True)
+        .assign(
+            teacher_area=lambda df_: df_["teacher_center"].map(center_map.get_center_area_map()),
+            teacher_position=lambda df_: rng.choice(["ET", "Senior ET", "CSM"], len(df_), p=[0.8, 0.15, 0.05]),
+        )
+    )
+
+
+def make_students(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    """
+        Make students with coco name, membership and pool of classes they join.
+        Membership is in the name, e.g. "NAME (DLX PP) FIRST", "NAME (GO) FIRST".
+
+    Args:
+        n (int): Number of students.
+        rng (np.random.Generator)
+
+    Returns:
+        pd.DataFrame: Students.
+    """
+    names = pd.Series(make_names(n, rng)).str.split(" ", n=1, expand=True)
+    kinds = rng.choice(["vip", "dlx", "go", "goc", "standard"], n, p=[0.12, 0.5, 0.2, 0.1, 0.08])
+    student_centers = pd.Series(rng.choice(centers, n))
+    tags = np.select(
+        [kinds == "vip", kinds == "dlx", (kinds == "go") | (kinds == "goc")],
+        [" (VIP " + student_centers + ") ", " (DLX " + student_centers + ") ", " (GO) "],
+        default=" ",
+    )
+    return pd.DataFrame(
+        {
+            "Student Name": names[0] + tags + names[1],
+            "Student Code": rng.choice(np.arange(1000, 1000 + n * 20), n, replace=False),
+            "Service Type": np.where(kinds == "vip", "VIP", "Standard"),
+            "Center Name": np.select(
+                [kinds == "goc", kinds == "go"],
+                ["Global Online Center", "IN: Online Center"],
+                default="IN: Indonesia",
+            ),
+            "kind": kinds,
+        }
+    )
+
+
+def _sample_students(
+    df_students: pd.DataFrame, pools: np.ndarray, rng: np.random.Generator
+) -> np.ndarray:
+    """Return index of one student per row, drawn from the pool of that row."""
+    kinds = df_students["kind"].to_numpy()
+    pool_kinds = {
+        "offline": ["dlx", "standard", "vip"],
+        "online": ["dlx", "go", "standard", "vip"],
+        "standard": ["dlx", "go", "standard"],
+        "goc": ["goc"],
+        "vip": ["vip"],
+    }
+    students = np.empty(len(pools), dtype=np.int64)
+    for pool, pool_kind in pool_kinds.items():
+        rows = np.flatnonzero(pools == pool)
+        candidates = np.flatnonzero(np.isin(kinds, pool_kind))
+        students[rows] = rng.choice(candidates, len(rows))
+    return students
+
+
+def make_month(
+    year: int, month: int, scale: float = 1, seed: int = 0
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+        Make one month of class attendance, one row per student per class.
+
+    Args:
+        year (int)
+        month (int)
+        scale (float, optional): 1 = about a real month. Defaults to 1.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        tuple: df_export (export layout, unique rows), df_teacher (trainer data).
+    """
+    rng = np.random.default_rng(seed)
+    df_teachers = make_teachers(max(int(n_teachers_per_scale * scale), 20), rng)
+    df_students = make_students(max(int(n_students_per_scale * scale), 50), rng)
+    teachers = df_teachers.dropna(subset="coco_name").reset_index(drop=True)
+
+    # sessions
+    n_sessions = max(int(n_sessions_per_scale * scale), 100)
+    names = list(class_types)
+    shares = np.array([class_types[name][0] for name in names])
+    session_types = rng.choice(names, n_sessions, p=shares / shares.sum())
+    days = pd.Period(year=year, month=month, freq="M").days_in_month
+    session_teachers = rng.integers(len(teachers), size=n_sessions)
+    is_online = pd.Series(session_types).str.startswith("Online").to_numpy()
+    is_shared = is_online & (session_types != "Online Encounter") & (rng.random(n_sessions) < 0.4)
+    teacher_centers = teachers["teacher_center"].to_numpy()[session_teachers]
+    is_vpg = rng.random(n_sessions) < 0.5
+    online_descriptions = rng.choice(["INT, ONLINE", "ADV, ONLINE", "PRE INT, ONLINE", "MLS+, ONLINE"], n_sessions)
+    offline_descriptions = np.char.add(
+        np.char.add("@", teacher_centers.astype(str)),
+        rng.choice([" OFFLINE CHAT HOUR", " OFFLINE GAME HOUR", " OFFLINE GRAMMAR AND VOCAB IN ACTION"], n_sessions),
+    )
+    df_sessions = pd.DataFrame(
+        {
+            "Type of Class\nAll Class": session_types,
+            "Class Startdate": pd.to_datetime(
+                pd.DataFrame({"year": year, "month": month, "day": rng.integers(1, days + 1, size=n_sessions)})
+            ).dt.strftime("%b %d %Y"),
+            "Class Start Time": rng.choice(class_hours, n_sessions),
+            "Duration": np.where(rng.random(n_sessions) < 0.02, 120, 60),
+            "Description": np.select(
+                [
+                    is_shared,
+                    (session_types == "Encounter") & is_vpg,
+                    (session_types == "Online English Corner") & is_vpg,
+                    is_online,
+                    rng.random(n_sessions) < 0.03,
+                    rng.random(n_sessions) < 0.85,
+                ],
+                [
+                    "Online Social Hour: The Trainer's Choice (INT) - "
+                    + rng.choice(shared_account_ets, n_sessions).astype(object),
+                    "VPG " + offline_descriptions.astype(object),
+                    "VPG, ONLINE",
+                    online_descriptions.astype(object),
+                    "CRE8 COMMUNITY " + offline_descriptions.astype(object),
+                    offline_descriptions.astype(object),
+                ],
+                default=None,
+            ),
+            "Unit": rng.integers(1, 21, size=n_sessions),
+            "Teacher": np.where(
+                is_shared,
+                rng.choice(shared_accounts, n_sessions),
+                teachers["coco_name"].to_numpy()[session_teachers],
+            ),
+            "pool": [class_types[name][2] for name in session_types],
+            "size": 1 + rng.poisson([class_types[name][1] - 1 for name in session_types]),
+        }
+    ).drop_duplicates(subset=["Teacher", "Class Startdate", "Class Start Time", "Type of Class\nAll Class"])
+
+    # one row per student per session
+    df_sessions = df_sessions.loc[df_sessions.index.repeat(df_sessions["size"])]
+    students = _sample_students(df_students, df_sessions["pool"].to_numpy(), rng)
+    df_export = (
+        pd.concat(
+            [
+                df_sessions.reset_index(drop=True),
+                df_students.iloc[students].reset_index(drop=True),
+            ],
+            axis=1,
+        )
+        # one student can only exist once at a time
+        .drop_duplicates(subset=["Student Code", "Class Startdate", "Class Start Time"])
+        .assign(
+            Result=lambda df_: rng.choice(list(results), len(df_), p=list(results.values())),
+            **{"": np.nan, " ": np.nan},
+        )
+        .reindex(columns=export_columns)
+        .reset_index(drop=True)
+    )
+    df_teacher = df_teachers[
+        ["coco_teacher_name", "teacher_center", "teacher_area", "teacher_position"]
+    ]
+    return df_export, df_teacher
+
+
+def write_month(
+    df_export: pd.DataFrame,
+    df_teacher: pd.DataFrame,
+    folder: Path,
+    year: int,
+    month: int,
+    n_files: int = 64,
+    n_exports: int = 14,
+    seed: int = 0,
+) -> tuple[Path, Path]:
+    """
+        Write df_export as MyCenterClass workbooks and df_teacher as trainer data.
+        Like the real exports, each row is exported n_exports times.
+
+    Args:
+        df_export (pd.DataFrame): See make_month.
+        df_teacher (pd.DataFrame): See make_month.
+        folder (Path): Output folder, files go to folder/input/{year}/{year}-{month}.
+        year (int)
+        month (int)
+        n_files (int, optional): Number of workbooks. Defaults to 64.
+        n_exports (int, optional): Times each row is exported. Defaults to 14.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        tuple: path_raw_data, path_trainer_data.
+    """
+    rng = np.random.default_rng(seed)
+    path_raw_data = Path(folder, "input", str(year), f"{year}-{month:02d}")
+    path_raw_data.mkdir(parents=True, exist_ok=True)
+    for file in path_raw_data.glob("*.xlsx"):
+        file.unlink()
+
+    rows = np.tile(np.arange(len(df_export)), n_exports)
+    files = np.array_split(rows[rng.permutation(len(rows))], n_files)
+    report_date = pd.Timestamp(year=year, month=month, day=1) + pd.offsets.MonthEnd()
+    for i, file_rows in enumerate(files, start=1):
+        path = Path(path_raw_data, f"{report_date:%Y-%m-%d} MyCenterClass ({i}).xlsx")
+        with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+            # header rows of the export, skipped by load_raw_data
+            df_export.iloc[np.sort(file_rows)].to_excel(writer, index=False, startrow=2)
+            sheet = writer.sheets["Sheet1"]
+            sheet.write(0, 0, f"Report Date : {report_date:%b %d %Y} \nCenter Name: IN: Indonesia")
+            sheet.write(0, 3, "My Center Classes\n")
+
+    path_trainer_data = Path(folder, "trainer.xlsx")
+    df_teacher.to_excel(path_trainer_data, sheet_name=f"{year}-{month:02d}", index=False)
+    return path_raw_data, path_trainer_data
+
+
+def main(args: list = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic Coco exports and trainer data.")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--month", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1, help="1 = about a real month")
+    parser.add_argument("--folder", type=Path, default=Path("synthetic"))
+    parser.add_argument("--n-files", type=int, default=64)
+    parser.add_argument("--n-exports", type=int, default=14, help="times each row is exported")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(args)
+
+    df_export, df_teacher = make_month(args.year, args.month, args.scale, args.seed)
+    path_raw_data, path_trainer_data = write_month(
+        df_export, df_teacher, args.folder, args.year, args.month,
+        args.n_files, args.n_exports, args.seed,
+    )
+    print(f"{len(df_export)} attendances written to {path_raw_data}, trainer data to {path_trainer_data}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+import module
+import pipeline
+import synthetic
+
+pytest.importorskip("polars")
+
+
+@pytest.mark.parametrize("is_utc", [False, True])
+def test_polars_engine_matches_pandas(tmp_path, monkeypatch, is_utc):
+    """
+    df_clean and df_session should be identical with pandas and polars engine.
+    """
+
+    df_export, df_teacher = synthetic.make_month(2024, 5, scale=0.3)
+    path_raw_data, path_trainer_data = synthetic.write_month(
+        df_export, df_teacher, tmp_path, 2024, 5, n_files=4, n_exports=2
+    )
+    monkeypatch.setattr(module, "path_trainer_data", path_trainer_data)
+    monkeypatch.setattr(module, "path_cache", tmp_path / "cache")
+    df = module.load_raw_data(
+        path_raw_data, True, month=None, n_jobs=1, cache_dir=tmp_path / "cache"
+    )
+    df = module.clean_student_name(df)
+
+    outputs = {}
+    for engine in ["pandas", "polars"]:
+        df_clean = pipeline.create_df_clean(
+            df, 5, "2024-05", is_utc, path_checkpoint=None, engine=engine
+        )
+        df_session = pipeline.create_df_session(df_clean, "2024-05", path_checkpoint=None)
+        outputs[engine] = df_clean, df_session
+
+    pd.testing.assert_frame_equal(outputs["pandas"][0], outputs["polars"][0])
+    pd.testing.assert_frame_equal(outputs["pandas"][1], outputs["polars"][1])
@@ -0,0 +1,17 @@
+import benchmark
+
+# peak RSS growth of the df_clean and df_session chains, as multiple of raw df size.
+# about 0.16 with copy-on-write (see module.py), 0.6 without
+memory_budget = 0.35
+
+
+def test_peak_memory_within_budget():
+    """
+    Peak memory of the chains should stay within memory_budget times the input size.
+    """
+
+    result = benchmark.measure_memory(scale=1)
+    assert result["ratio"] <= memory_budget, (
+        f"peak memory grew {result['growth_mb']:.0f} MB for {result['input_mb']:.0f} MB input "
+        f"({result['ratio']:.2f}x, budget {memory_budget}x)"
+    )
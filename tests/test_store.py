@@ -0,0 +1,23 @@
+import pandas as pd
+
+import store
+
+
+def test_read_column_missing_in_earlier_month(tmp_path):
+    """
+    A column added in a later month should be NaN in earlier months, also when projected.
+    """
+
+    df_old = pd.DataFrame({"teacher": ["A", "B"], "class_booking": [1, 2]})
+    df_new = df_old.assign(class_mode=["Online", "Offline"])
+    store.write_partition(df_old, "cube", 2024, 4, tmp_path)
+    store.write_partition(df_new, "cube", 2024, 5, tmp_path)
+
+    df = store.read("cube", "2024-04", "2024-05", columns=["teacher", "class_mode"], root=tmp_path)
+    assert list(df.columns) == ["teacher", "class_mode"]
+    assert df["teacher"].astype(str).tolist() == ["A", "B", "A", "B"]
+    assert df["class_mode"].isna().tolist() == [True, True, False, False]
+    assert df["class_mode"].iloc[2:].astype(str).tolist() == ["Online", "Offline"]
+
+    df = store.read("cube", "2024-04", "2024-05", root=tmp_path)
+    assert df["class_mode"].isna().sum() == 2
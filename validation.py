@@ -0,0 +1,303 @@
+"""
+Validate df_clean and df_session, reporting every violation at once.
+Each check returns the violating values (not rows), counted with one
+value_counts/groupby pass over the frame, so a big month is scanned once per check.
+
+Usage:
+    report = validation.validate(df, df_clean, df_session, "2024-05")
+    print(validation.format_report(report))
+    validation.assert_valid(report)
+    validation.assert_check(validation.check_teacher_pos_is_complete, df_clean)  # one check
+"""
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+import config
+import module
+
+center_map = config.CenterMap()  # initialize center map class
+
+
+def _count(df: pd.DataFrame, mask: pd.Series, columns: list) -> pd.DataFrame:
+    """Return distinct values of columns where mask is true, with row count."""
+    return (
+        df.loc[mask, columns]
+        .astype(str)
+        .value_counts(dropna=False)
+        .rename("n_rows")
+        .reset_index()
+    )
+
+
+def _check_values(series: pd.Series, expected: list, exact: bool = True) -> pd.DataFrame:
+    """
+        Compare distinct values of series with expected values.
+
+    Args:
+        series (pd.Series)
+        expected (list): Allowed values.
+        exact (bool, optional): If True, every expected value must also exist. Defaults to True.
+
+    Returns:
+        pd.DataFrame: Unknown (and missing) values.
+    """
+    counts = series.astype(str).value_counts(dropna=False)
+    unknown = counts.loc[~counts.index.isin(expected)]
+    violations = pd.DataFrame(
+        {"value": unknown.index, "problem": "unknown", "n_rows": unknown.values}
+    )
+    if exact:
+        missing = [value for value in expected if value not in counts.index]
+        violations = pd.concat(
+            [violations, pd.DataFrame({"value": missing, "problem": "missing", "n_rows": 0})],
+            ignore_index=True,
+        )
+    return violations
+
+
+def _check_center_area(df: pd.DataFrame, center_col: str, area_col: str) -> pd.DataFrame:
+    """Return (center, area) pairs whose area does not match center_map."""
+    # note: unknown centers are not checked, same as old centers that are gone
+    pairs = df[[center_col, area_col]].astype(str).value_counts().rename("n_rows").reset_index()
+    areas = center_map.map_areas(pairs[center_col], default=None)
+    return pairs.loc[areas.notna() & (pairs[area_col] != areas.astype(str))].reset_index(drop=True)
+
+
+# checks of df_clean
+
+
+def check_online_class_is_online_location(df_clean: pd.DataFrame) -> pd.DataFrame:
+    """Class location online should have class area online."""
+    mask = (df_clean["class_location"] == "Online") & (df_clean["class_area"] != "Online")
+    return _count(df_clean, mask, ["class_location", "class_area"])
+
+
+def check_class_with_online_name_is_online_location(df_clean: pd.DataFrame) -> pd.DataFrame:
+    """Class that has online should have online location."""
+    online = module.map_unique(
+        df_clean["class_type"], lambda class_types: class_types.str.contains("Online", na=False)
+    )
+    mask = online & (df_clean["class_location"] != "Online")
+    return _count(df_clean, mask, ["class_type", "class_location"])
+
+
+def check_class_center_match_with_class_area(df_clean: pd.DataFrame) -> pd.DataFrame:
+    """Class center should match with the correct area."""
+    return _check_center_area(df_clean, "class_location", "class_area")
+
+
+def check_teacher_center_match_with_teacher_area(df_clean: pd.DataFrame) -> pd.DataFrame:
+    """Teacher center should match with the correct area."""
+    return _check_center_area(df_clean, "teacher_center", "teacher_area")
+
+
+def check_no_class_time_is_missing(df_clean: pd.DataFrame) -> pd.DataFrame:
+    """Class should have time."""
+    return _count(df_clean, df_clean["class_time"].isna(), ["teacher", "class_date"])
+
+
+def check_shared_account_et_is_mapped(df: pd.DataFrame) -> pd.DataFrame:
+    """
+        Teacher that use shared account should have map in module.shared_acc_et_map
+        because scheduling team sometimes does not put the complete name.
+        Checked on raw df.
+    """
+    shared_acc = module.is_shared_account(df["Teacher"])
+    ets = module.map_unique(
+        df["Description"],
+        lambda descriptions: descriptions.str.split("-").str[-1].str.strip().str.lower(),
+    )
+    mask = shared_acc & ets.notna() & ~ets.isin(module.shared_acc_et_map.keys())
+    return _count(df.assign(et=ets), mask, ["et"])
+
+
+def check_shared_account_class_is_mapped(df_clean: pd.DataFrame) -> pd.DataFrame:
+    """All class that is taught by teacher using share account must be mapped to real teacher."""
+    mask = (
+        df_clean[["teacher_center", "teacher_area", "teacher_position"]] == "Shared Account"
+    ).any(axis=1)
+    return _count(df_clean, mask, ["teacher"])
+
+
+def check_goc_class_have_goc_mode(df_clean: pd.DataFrame) -> pd.DataFrame:
+    """GOC class should have GOC mode."""
+    mask = (df_clean["student_center"] == "Global Online Center") & (
+        df_clean["class_mode"] != "GOC"
+    )
+    return _count(df_clean, mask, ["student_center", "class_mode"])
+
+
+def check_teacher_pos_is_complete(df_clean: pd.DataFrame) -> pd.DataFrame:
+    """All trainer should have position."""
+    return _count(df_clean, df_clean["teacher_position"].isna(), ["teacher"])
+
+
+def check_student_membership_is_mapped(df_clean: pd.DataFrame) -> pd.DataFrame:
+    """There should only be three memberships."""
+    return _check_values(df_clean["student_membership"], ["Deluxe", "GO", "VIP"])
+
+
+def check_one_code_is_one_name(
+    df_clean: pd.DataFrame, code_col: str = "student_code", name_col: str = "student_name"
+) -> pd.DataFrame:
+    """One code must have one name only."""
+    return (
+        df_clean
+        .groupby(code_col, observed=True)
+        .agg(n_names=(name_col, "nunique"), n_rows=(name_col, "size"))
+        .loc[lambda df_: df_["n_names"] > 1]
+        .reset_index()
+    )
+
+
+# checks of df_session
+
+
+def check_online_class_in_online_location(df_session: pd.DataFrame) -> pd.DataFrame:
+    """Class online should have class location online."""
+    online = df_session["class_type"].astype(str).str.contains("Online") | df_session[
+        "class_type_grouped"
+    ].astype(str).str.contains("Online")
+    mask = online & (df_session["class_location"] != "Online")
+    return _count(df_session, mask, ["class_type", "class_type_grouped", "class_location"])
+
+
+def check_booking_higher_than_eq_attendance(df_session: pd.DataFrame) -> pd.DataFrame:
+    """Booking should be >= attendance."""
+    mask = df_session["class_booking"] < df_session["class_attendance"]
+    return _count(df_session, mask, ["teacher", "class_date", "class_time", "class_type"])
+
+
+def check_vip_class_mapped(df_session: pd.DataFrame, df_teacher_sheet_name: str) -> pd.DataFrame:
+    """
+        VIP should have only one-on-one and VPG class.
+        In 2023-06 there are VIP members who joined GOC.
+    """
+    if df_teacher_sheet_name == "2023-06":
+        vips = ["GOC", "One-on-one", "Online One-on-one", "Online VPG", "VPG"]
+    else:
+        vips = ["One-on-one", "Online One-on-one", "Online VPG", "VPG"]
+    class_types = df_session.loc[df_session["class_service"] == "VIP", "class_type_grouped"]
+    return _check_values(class_types, vips)
+
+
+def check_class_service_mapped(df_session: pd.DataFrame) -> pd.DataFrame:
+    """There should be only three class service."""
+    return _check_values(df_session["class_service"], ["Deluxe", "Deluxe & Go", "VIP"])
+
+
+def check_class_type_all_filled(df_session: pd.DataFrame) -> pd.DataFrame:
+    """Class type should not be blank."""
+    return _count(df_session, df_session["class_type"].isna(), ["teacher", "class_date"])
+
+
+def check_class_type_grouped_all_filled(df_session: pd.DataFrame) -> pd.DataFrame:
+    """Class type grouped should not be blank."""
+    mask = df_session["class_type_grouped"].isna()
+    return _count(df_session, mask, ["teacher", "class_date", "class_type"])
+
+
+def check_no_enc_in_class_type_grouped(df_session: pd.DataFrame) -> pd.DataFrame:
+    """There should not be encounter in class type grouped."""
+    mask = df_session["class_type_grouped"] == "Encounter"
+    return _count(df_session, mask, ["teacher", "class_type_grouped"])
+
+
+def check_class_grouping_is_correct(df_session: pd.DataFrame) -> pd.DataFrame:
+    """Class grouping should be in ["Standard", "VIP", "Other"]."""
+    return _check_values(df_session["class_grouping"], ["Standard", "VIP", "Other"], exact=False)
+
+
+def validate(
+    df: pd.DataFrame,
+    df_clean: pd.DataFrame,
+    df_session: pd.DataFrame,
+    df_teacher_sheet_name: str,
+) -> pd.DataFrame:
+    """
+        Run every check, without stopping at the first failure.
+
+    Args:
+        df (pd.DataFrame): Raw df.
+        df_clean (pd.DataFrame)
+        df_session (pd.DataFrame)
+        df_teacher_sheet_name (str): Sheet name in trainer data.
+
+    Returns:
+        pd.DataFrame: Report, one row per check with its violations.
+    """
+    checks = [
+        ("raw", check_shared_account_et_is_mapped, df, {}),
+        ("clean", check_online_class_is_online_location, df_clean, {}),
+        ("clean", check_class_with_online_name_is_online_location, df_clean, {}),
+        ("clean", check_class_center_match_with_class_area, df_clean, {}),
+        ("clean", check_teacher_center_match_with_teacher_area, df_clean, {}),
+        ("clean", check_no_class_time_is_missing, df_clean, {}),
+        ("clean", check_shared_account_class_is_mapped, df_clean, {}),
+        ("clean", check_goc_class_have_goc_mode, df_clean, {}),
+        ("clean", check_teacher_pos_is_complete, df_clean, {}),
+        ("clean", check_student_membership_is_mapped, df_clean, {}),
+        ("clean", check_one_code_is_one_name, df_clean, {}),
+        ("session", check_online_class_in_online_location, df_session, {}),
+        ("session", check_booking_higher_than_eq_attendance, df_session, {}),
+        (
+            "session",
+            check_vip_class_mapped,
+            df_session,
+            {"df_teacher_sheet_name": df_teacher_sheet_name},
+        ),
+        ("session", check_class_service_mapped, df_session, {}),
+        ("session", check_class_type_all_filled, df_session, {}),
+        ("session", check_class_type_grouped_all_filled, df_session, {}),
+        ("session", check_no_enc_in_class_type_grouped, df_session, {}),
+        ("session", check_class_grouping_is_correct, df_session, {}),
+    ]
+    report = []
+    for frame, check, df_check, kwargs in checks:
+        violations = check(df_check, **kwargs)
+        report.append(
+            {
+                "check": check.__name__.removeprefix("check_"),
+                "frame": frame,
+                "passed": len(violations) == 0,
+                "n_violations": len(violations),
+                "violations": violations,
+            }
+        )
+    return pd.DataFrame(report)
+
+
+def format_report(report: pd.DataFrame, max_rows: int = 10) -> str:
+    """Return failed checks and their first violations as text."""
+    failed = report.loc[~report["passed"]]
+    lines = [f"{len(failed)} of {len(report)} checks failed."]
+    for row in failed.itertuples():
+        lines.append(f"{row.frame}: {row.check} ({row.n_violations} violations)")
+        lines.append(row.violations.head(max_rows).to_string(index=False))
+    return "\n".join(lines)
+
+
+def save_report(report: pd.DataFrame, path: Path) -> None:
+    """Save report as json, violations as list of records."""
+    records = [
+        {**row, "violations": row["violations"].to_dict(orient="records")}
+        for row in report.to_dict(orient="records")
+    ]
+    Path(path).write_text(json.dumps(records, indent=4, default=str))
+
+
+def assert_check(check, df: pd.DataFrame, **kwargs) -> None:
+    """Run one check, raise AssertionError listing its violations. Used by tests/."""
+    violations = check(df, **kwargs)
+    assert violations.empty, (
+        f"{check.__name__.removeprefix('check_')} ({len(violations)} violations)\n"
+        + violations.to_string(index=False)
+    )
+
+
+def assert_valid(report: pd.DataFrame) -> None:
+    """Raise AssertionError listing every failed check."""
+    assert report["passed"].all(), format_report(report)